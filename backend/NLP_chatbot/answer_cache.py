@@ -0,0 +1,177 @@
+"""
+Answer cache for questions asked about the same document.
+
+Many users upload the same form and ask it the same things ("what is the
+deadline?", "where do I sign?"). Answers are cached per (document content
+hash, normalized question, answer language), so any session asking about
+an identical document can reuse them.
+
+Questions are normalized by casefolding and dropping punctuation and extra
+whitespace. A question with no exact match may still reuse the answer to a
+lightly reworded one about the same document and language: their word
+sets need a Jaccard similarity of at least ANSWER_CACHE_SIMILARITY, and
+they must contain the same numbers and the same negations. "page 2" never
+matches "page 3", and "who must not sign?" never matches "who must sign?".
+
+Only first questions are cached. When earlier turns are in the prompt,
+the answer may depend on them ("and the second one?"), so the caller
+bypasses the cache. Entries expire after ANSWER_CACHE_TTL_SEC. Past
+ANSWER_CACHE_SIZE, the least recently used entries are dropped.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from doc_index import tokenize
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_TTL_SEC = float(os.getenv("ANSWER_CACHE_TTL_SEC", "86400"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.75"))
+MAX_PER_DOCUMENT = 256  # questions scanned for near-duplicates per (document, language)
+
+# Negation words of the common chat languages, as tokenize() yields them ("isn't" -> "isn", "t").
+# Listing too many only costs near-duplicate hits; missing one can serve the opposite answer.
+_NEGATIONS = frozenset("""
+    not no never without nor none nothing nobody neither cannot t don doesn didn isn aren wasn weren
+    won wouldn shouldn couldn hasn haven hadn mustn needn
+    nunca sin ni nada nadie ningún ninguna ninguno tampoco jamás
+    ne n pas jamais sans non aucun aucune rien
+    nicht kein keine keinen keinem keiner keines nie niemals ohne nein weder nichts
+    mai senza nessun nessuno nessuna niente nulla né
+    não sem nem nenhum nenhuma ninguém
+    niet geen nooit zonder nee niets niemand
+    inte ej aldrig utan ikke aldri uden ingen
+    nie bez nigdy żaden żadna żadne nic
+    не нет ни никогда без ничего никто ні ніколи немає
+    δεν μη μην χωρίς ποτέ όχι
+    değil yok hiç asla olmadan hayır
+    لا لم لن ليس ليست غير بدون نه نیست هرگز לא אין בלי ללא
+    नहीं न मत बिना
+    không chưa chẳng đừng tidak bukan tanpa belum jangan tak
+    ない せん
+""".split())
+_NEGATION_CHARS = frozenset("不没沒无無未别別非않못없")  # CJK tokens are bigrams; match inside them
+
+
+class AnswerKey(NamedTuple):
+    doc_hash: str
+    lang: str
+    question: str   # normalized
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(tokenize(question))
+
+
+def _words(question: str) -> frozenset:
+    return frozenset(question.split())
+
+
+def _numbers(words) -> frozenset:
+    return frozenset(w for w in words if any(c.isdigit() for c in w))
+
+
+def _negations(words) -> frozenset:
+    return frozenset(w for w in words if w in _NEGATIONS or any(c in _NEGATION_CHARS for c in w))
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl_sec: float = ANSWER_CACHE_TTL_SEC,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_sec
+        self.similarity = similarity
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries = OrderedDict()  # AnswerKey -> (answer, created), least recent first
+        self._by_doc = {}              # (doc_hash, lang) -> {normalized question: words}
+        self._lock = threading.Lock()
+
+    def key(self, doc_hash: str, lang: str, question: str) -> AnswerKey:
+        return AnswerKey(doc_hash, lang, normalize_question(question))
+
+    def get(self, key: AnswerKey) -> Optional[str]:
+        """Cached answer for the question or a near-duplicate of it, else None."""
+        now = time.time()
+        with self._lock:
+            answer = self._live(key, now)
+            if answer is not None:
+                self.hits += 1
+                return answer
+            near = self._near_duplicate(key, now)
+            if near is not None:
+                self.near_hits += 1
+                return near
+            self.misses += 1
+            return None
+
+    def bypass(self):
+        """Count a turn that could not use the cache (history in the prompt)."""
+        with self._lock:
+            self.bypassed += 1
+
+    def put(self, key: AnswerKey, answer: str):
+        if not key.question or not answer:
+            return
+        with self._lock:
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            questions = self._by_doc.setdefault((key.doc_hash, key.lang), {})
+            questions[key.question] = _words(key.question)
+            if len(questions) > MAX_PER_DOCUMENT:
+                oldest = next(iter(questions))
+                self._remove(AnswerKey(key.doc_hash, key.lang, oldest))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _live(self, key: AnswerKey, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now - self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _near_duplicate(self, key: AnswerKey, now: float) -> Optional[str]:
+        questions = self._by_doc.get((key.doc_hash, key.lang))
+        if not questions:
+            return None
+        words = _words(key.question)
+        numbers, negations = _numbers(words), _negations(words)
+        best, best_score = None, self.similarity
+        for question, other in questions.items():
+            if _numbers(other) != numbers or _negations(other) != negations:
+                continue
+            score = len(words & other) / len(words | other)
+            if score >= best_score:
+                best, best_score = question, score
+        if best is None:
+            return None
+        return self._live(AnswerKey(key.doc_hash, key.lang, best), now)
+
+    def _remove(self, key: AnswerKey):
+        self._entries.pop(key, None)
+        questions = self._by_doc.get((key.doc_hash, key.lang))
+        if questions is not None:
+            questions.pop(key.question, None)
+            if not questions:
+                del self._by_doc[(key.doc_hash, key.lang)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            }
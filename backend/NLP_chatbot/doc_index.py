@@ -0,0 +1,139 @@
+"""
+Retrieval over a translated document's text.
+
+When the translator persists an output it writes <output>.text.json next
+to it: per page, the OCR'd source segments and their translations. The
+first chat turn about a document splits that into chunks of about
+CHUNK_WORDS words (never across pages) and builds an in-memory BM25 index
+over the source and translated wording together, so questions match in
+either language. Later turns reuse the index; only the top-k chunks for
+the question go into the prompt.
+
+Indexes are cached per (sidecar path, mtime, size) in a small LRU.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+CHUNK_WORDS = int(os.getenv("DOC_CHUNK_WORDS", "80"))
+TOP_K = int(os.getenv("DOC_TOP_K", "4"))
+INDEX_CACHE_SIZE = int(os.getenv("DOC_INDEX_CACHE_SIZE", "32"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]")
+
+
+def tokenize(text: str) -> list:
+    """Casefolded word tokens; CJK runs (no spaces) are split into character bigrams."""
+    tokens = []
+    for word in _WORD.findall(text.casefold()):
+        if _CJK.search(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def sidecar_for(document: Path) -> Path:
+    return document.with_name(document.name + ".text.json")
+
+
+class Chunk(NamedTuple):
+    page: int       # 1-based
+    text: str       # what goes into the prompt (translated wording)
+    tokens: list    # source + translated wording
+
+
+def chunk_pages(pages, lang: Optional[str] = None, max_words: int = CHUNK_WORDS) -> list:
+    """
+    Group consecutive segments of each page into ~max_words chunks. The
+    prompt text uses the translation into lang when the sidecar has it.
+    """
+    chunks = []
+    for page_no, page in enumerate(pages, start=1):
+        source = page.get("source", [])
+        translated = page.get(lang) if lang in page else next(
+            (v for k, v in page.items() if k != "source"), source)
+        current, current_tokens, words = [], [], 0
+        for i, src in enumerate(source):
+            shown = translated[i] if i < len(translated) and translated[i] else src
+            current.append(shown)
+            current_tokens += tokenize(src) + (tokenize(shown) if shown != src else [])
+            words += len(shown.split())
+            if words >= max_words:
+                chunks.append(Chunk(page_no, " ".join(current), current_tokens))
+                current, current_tokens, words = [], [], 0
+        if current:
+            chunks.append(Chunk(page_no, " ".join(current), current_tokens))
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.tf = [Counter(c.tokens) for c in chunks]
+        self.lengths = [len(c.tokens) for c in chunks]
+        self.avg_len = (sum(self.lengths) / len(chunks)) if chunks else 0.0
+        df = Counter(token for tf in self.tf for token in tf)
+        n = len(chunks)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        """Top-k chunks for the query, best first, in (score, chunk) pairs; zero scores dropped."""
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        if not terms:
+            return []
+        scored = []
+        for i, tf in enumerate(self.tf):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / (self.avg_len or 1))
+            score = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    score += self.idf[t] * f * (BM25_K1 + 1) / (f + norm)
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [(score, self.chunks[i]) for score, i in scored[:k]]
+
+
+class DocumentIndexCache:
+    def __init__(self, max_entries: int = INDEX_CACHE_SIZE):
+        self.max_entries = max(1, max_entries)
+        self.builds = 0
+        self._indexes = OrderedDict()  # (path, mtime_ns, size, lang) -> BM25Index
+        self._lock = threading.Lock()
+
+    def get(self, document: Path, lang: Optional[str] = None) -> Optional[BM25Index]:
+        """Index for a document's text sidecar, or None when it has none."""
+        sidecar = sidecar_for(Path(document))
+        try:
+            st = os.stat(sidecar)
+        except FileNotFoundError:
+            return None
+        key = (str(sidecar), st.st_mtime_ns, st.st_size, lang)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+        with open(sidecar, encoding="utf-8") as f:
+            pages = json.load(f).get("pages", [])
+        index = BM25Index(chunk_pages(pages, lang))
+        with self._lock:
+            self.builds += 1
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"indexes": len(self._indexes), "max_indexes": self.max_entries, "builds": self.builds}
@@ -0,0 +1,176 @@
+"""
+Document store for the chatbot: which translated documents exist, and
+their bytes.
+
+Each watched folder keeps an index of its images sorted by mtime. The
+index is rebuilt only when the folder's own mtime changes (a file was
+added, removed or renamed), so a chat turn costs one stat of the folder
+instead of a glob plus a stat per file. Writers can also call notify() to
+update the index right away.
+
+File contents are cached as raw encoded bytes plus a MIME type sniffed
+from the file signature, keyed by (path, mtime, size) in an LRU bounded
+by DOC_CACHE_MB. A chat turn never decodes an image. digest() gives a
+content hash per (path, mtime, size), computed once.
+"""
+import bisect
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DOC_CACHE_MB = float(os.getenv("DOC_CACHE_MB", "64"))
+MAX_DIGESTS = 1024
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+
+
+def sniff_mime(data: bytes) -> Optional[str]:
+    for magic, mime in _SIGNATURES:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class _FolderIndex:
+    def __init__(self, folder: Path, extensions):
+        self.folder = folder
+        self.extensions = extensions
+        self.dir_mtime = None
+        self.entries = []   # sorted [(mtime_ns, name)]
+        self.by_name = {}   # name -> mtime_ns
+
+    def refresh(self):
+        try:
+            dir_mtime = os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            self.dir_mtime, self.entries, self.by_name = None, [], {}
+            return
+        if dir_mtime == self.dir_mtime:
+            return
+        by_name = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.lower().endswith(self.extensions) and entry.is_file():
+                    by_name[entry.name] = entry.stat().st_mtime_ns
+        self.by_name = by_name
+        self.entries = sorted((mtime, name) for name, mtime in by_name.items())
+        self.dir_mtime = dir_mtime
+
+    def update(self, name: str, mtime_ns: Optional[int]):
+        old = self.by_name.pop(name, None)
+        if old is not None:
+            self.entries.remove((old, name))
+        if mtime_ns is not None:
+            self.by_name[name] = mtime_ns
+            bisect.insort(self.entries, (mtime_ns, name))
+
+
+class DocumentStore:
+    def __init__(self, folders, extensions=IMAGE_EXTENSIONS, max_bytes: int = int(DOC_CACHE_MB * 1024 * 1024)):
+        self.extensions = tuple(extensions)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._indexes = {Path(f): _FolderIndex(Path(f), self.extensions) for f in folders}
+        self._cache = OrderedDict()   # (path, mtime_ns, size) -> (bytes, mime)
+        self._cached_bytes = 0
+        self._digests = OrderedDict()  # (path, mtime_ns, size) -> sha256 hex
+        self._lock = threading.Lock()
+
+    def _index(self, folder: Path) -> _FolderIndex:
+        folder = Path(folder)
+        if folder not in self._indexes:
+            self._indexes[folder] = _FolderIndex(folder, self.extensions)
+        index = self._indexes[folder]
+        index.refresh()
+        return index
+
+    def latest(self, folder) -> Path:
+        """Newest document in folder by mtime."""
+        with self._lock:
+            index = self._index(folder)
+            if not index.entries:
+                raise FileNotFoundError(f"No images found in {folder}")
+            return index.folder / index.entries[-1][1]
+
+    def notify(self, path):
+        """Tell the store a file was written or deleted, without waiting for a rescan."""
+        path = Path(path)
+        with self._lock:
+            index = self._index(path.parent)
+            if not path.name.lower().endswith(self.extensions):
+                return
+            try:
+                index.update(path.name, os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                index.update(path.name, None)
+
+    def load(self, path) -> tuple[bytes, str]:
+        """Encoded bytes and MIME type of a document, from cache when unchanged on disk."""
+        path = Path(path)
+        st = os.stat(path)
+        key = (str(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        data = path.read_bytes()
+        mime = sniff_mime(data)
+        if mime is None:
+            raise ValueError(f"{path.name} is not a PNG, JPEG or WebP image")
+
+        with self._lock:
+            # Drop stale versions of the same file before adding the new one
+            for old in [k for k in self._cache if k[0] == key[0]]:
+                self._cached_bytes -= len(self._cache.pop(old)[0])
+            if len(data) <= self.max_bytes:
+                self._cache[key] = (data, mime)
+                self._cached_bytes += len(data)
+                while self._cached_bytes > self.max_bytes:
+                    _, (old_data, _) = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(old_data)
+        return data, mime
+
+    def digest(self, path) -> str:
+        """sha256 of a document's bytes, so identical uploads share one key."""
+        path = Path(path)
+        st = os.stat(path)
+        key = (str(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                return digest
+        digest = hashlib.sha256(self.load(path)[0]).hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+            while len(self._digests) > MAX_DIGESTS:
+                self._digests.popitem(last=False)
+        return digest
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._cached_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "indexed": {str(f): len(i.entries) for f, i in self._indexes.items()},
+            }
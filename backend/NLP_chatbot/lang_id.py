@@ -0,0 +1,163 @@
+"""
+Language identification for chat messages.
+
+Most scripts name their language outright, so one pass over the text's
+letters, counting them per Unicode script, settles it: Bengali is bn,
+Hangul is ko, any kana is ja. Arabic, Cyrillic and Devanagari are shared
+by several languages. For those, a few letters that only one of them uses
+decide (Persian گ, Urdu ے, Ukrainian ї), and otherwise the script's most
+common language wins. Russian and Bulgarian share every letter, so
+unmarked Cyrillic of at least LANG_ID_MIN_DETECT_LETTERS letters goes to
+langdetect's statistical model; shorter Cyrillic is taken as Russian.
+Text that is mostly Latin goes to the model too, but Latin messages of
+fewer than LANG_ID_MIN_LATIN_LETTERS letters return None, because the
+model is close to random on them ("hi" comes back as Swahili).
+
+Codes match langdetect's (zh-cn, he, ...). Results for short messages are
+memoized. Call warm() at startup so langdetect's profiles are loaded
+before the first chat rather than during it.
+"""
+import bisect
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Optional
+
+from langdetect import DetectorFactory, detect
+from langdetect.detector_factory import init_factory
+
+DetectorFactory.seed = 0  # deterministic language detection
+
+LANG_ID_MIN_LATIN_LETTERS = int(os.getenv("LANG_ID_MIN_LATIN_LETTERS", "8"))
+LANG_ID_MIN_DETECT_LETTERS = int(os.getenv("LANG_ID_MIN_DETECT_LETTERS", "8"))  # unmarked Cyrillic
+MEMO_MAX_CHARS = 200
+
+# (first code point, last code point, script), sorted
+_SCRIPT_RANGES = sorted([
+    (0x0041, 0x024F, "latin"),
+    (0x1E00, 0x1EFF, "latin"),
+    (0x0370, 0x03FF, "greek"),
+    (0x1F00, 0x1FFF, "greek"),
+    (0x0400, 0x052F, "cyrillic"),
+    (0x0530, 0x058F, "armenian"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0xFB50, 0xFDFF, "arabic"),
+    (0xFE70, 0xFEFF, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0A00, 0x0A7F, "gurmukhi"),
+    (0x0A80, 0x0AFF, "gujarati"),
+    (0x0B00, 0x0B7F, "oriya"),
+    (0x0B80, 0x0BFF, "tamil"),
+    (0x0C00, 0x0C7F, "telugu"),
+    (0x0C80, 0x0CFF, "kannada"),
+    (0x0D00, 0x0D7F, "malayalam"),
+    (0x0D80, 0x0DFF, "sinhala"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x0E80, 0x0EFF, "lao"),
+    (0x1000, 0x109F, "myanmar"),
+    (0x10A0, 0x10FF, "georgian"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x1200, 0x137F, "ethiopic"),
+    (0x1780, 0x17FF, "khmer"),
+    (0x3040, 0x30FF, "kana"),
+    (0x31F0, 0x31FF, "kana"),
+    (0x3130, 0x318F, "hangul"),
+    (0x3400, 0x4DBF, "han"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xF900, 0xFAFF, "han"),
+    (0xAC00, 0xD7AF, "hangul"),
+])
+_RANGE_STARTS = [r[0] for r in _SCRIPT_RANGES]
+
+_SCRIPT_LANG = {
+    "greek": "el", "armenian": "hy", "hebrew": "he", "bengali": "bn", "gurmukhi": "pa",
+    "gujarati": "gu", "oriya": "or", "tamil": "ta", "telugu": "te", "kannada": "kn",
+    "malayalam": "ml", "sinhala": "si", "thai": "th", "lao": "lo", "myanmar": "my",
+    "georgian": "ka", "hangul": "ko", "ethiopic": "am", "khmer": "km", "kana": "ja",
+    "han": "zh-cn", "arabic": "ar", "cyrillic": "ru", "devanagari": "hi",
+}
+
+# Letters that only one language sharing the script uses, checked in order
+_MARKERS = {
+    "arabic": (("ur", "ٹڈڑںےۓھ"), ("fa", "پچژگکی")),
+    "cyrillic": (("uk", "іїєґІЇЄҐ"), ("sr", "ђћџљњЂЋЏЉЊ"), ("mk", "ѓќѕЃЌЅ")),
+    "devanagari": (("mr", "ळ"),),
+}
+
+# Unmarked text in these scripts is left to langdetect, limited to these answers
+_DETECT_UNMARKED = {"cyrillic": ("ru", "bg", "uk", "mk")}
+
+
+def _script(ch: str) -> Optional[str]:
+    i = bisect.bisect_right(_RANGE_STARTS, ord(ch)) - 1
+    if i >= 0 and ord(ch) <= _SCRIPT_RANGES[i][1]:
+        return _SCRIPT_RANGES[i][2]
+    return None
+
+
+def _count_scripts(text: str) -> dict:
+    counts = {}
+    for ch in text:
+        if ch.isalpha() or unicodedata.category(ch) in ("Mn", "Mc"):
+            script = _script(ch)
+            if script is not None:
+                counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+def _from_script(script: str, text: str, count: int) -> str:
+    if script == "han" and any(_script(ch) == "kana" for ch in text):
+        return "ja"
+    for lang, letters in _MARKERS.get(script, ()):
+        if any(ch in letters for ch in text):
+            return lang
+    if script in _DETECT_UNMARKED and count >= LANG_ID_MIN_DETECT_LETTERS:
+        lang = _detect(text)
+        if lang in _DETECT_UNMARKED[script]:
+            return lang
+    # Too short to tell apart reliably, or detected as something else:
+    # take the script's most common language
+    return _SCRIPT_LANG[script]
+
+
+def _detect(text: str) -> Optional[str]:
+    try:
+        return detect(text).lower()
+    except Exception:
+        return None
+
+
+def _identify(text: str) -> Optional[str]:
+    counts = _count_scripts(text)
+    if not counts:
+        return None
+    latin = counts.pop("latin", 0)
+    if counts:
+        script = max(counts, key=counts.get)
+        if counts[script] >= latin:
+            return _from_script(script, text, counts[script])
+    if latin < LANG_ID_MIN_LATIN_LETTERS:
+        return None
+    return _detect(text)
+
+
+@lru_cache(maxsize=4096)
+def _identify_memo(text: str) -> Optional[str]:
+    return _identify(text)
+
+
+def identify(text: str) -> Optional[str]:
+    """Language code for text, or None when it can't be told (too short, no letters)."""
+    text = (text or "").strip()
+    if len(text) <= MEMO_MAX_CHARS:
+        return _identify_memo(text)
+    return _identify(text)
+
+
+def warm():
+    """Load langdetect's profiles now instead of on the first Latin-script message."""
+    init_factory()
+    identify("This warms up the language detector.")
@@ -1,19 +1,26 @@
 import os
-import io
+import sys
+import json
 import logging
 from pathlib import Path
-from typing import Optional
-import requests
+from typing import NamedTuple, Optional
 from dotenv import load_dotenv
 
-from langdetect import detect, DetectorFactory
-DetectorFactory.seed = 0  # deterministic language detection
-
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from collections import defaultdict, deque
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from PIL import Image
+
+from answer_cache import AnswerCache, AnswerKey
+from doc_store import DocumentStore
+import lang_id
+from doc_index import DocumentIndexCache, TOP_K
+from session_store import Session, new_session_id, open_session_store, valid_session_id
+
+# Shared backend helpers (backend/common)
+sys.path.append(str(Path(__file__).resolve().parents[1] / "common"))
+import http_client
 
 # Load .env
 load_dotenv()
@@ -22,9 +29,8 @@ load_dotenv()
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "*")
 
 app = FastAPI(title="Document QA Chatbot")
-SESSION_LANG = defaultdict(lambda: "en")
-SESSION_HISTORY = defaultdict(lambda: deque(maxlen=5))
-SESSION_DOC = defaultdict(lambda: None)
+# Per-client language, document and recent history (SESSION_BACKEND=sqlite to share across workers)
+SESSIONS = open_session_store()
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[FRONTEND_ORIGIN] if FRONTEND_ORIGIN != "*" else ["*"],
@@ -39,6 +45,8 @@ if not GEMINI_KEY:
     raise RuntimeError("Missing GOOGLE_API_KEY in .env")
 
 GEMINI_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash-latest:generateContent"
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:streamGenerateContent"
+GEMINI_FALLBACK_REPLY = "Sorry, I couldn't extract an answer from the document."
 
 # Paths from your pipeline (point to .../CareBridge/backend/document_translator)
 BACKEND_DIR = Path(__file__).resolve().parents[1]  # .../CareBridge/backend
@@ -52,56 +60,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Indexed view of the translator's folders + LRU of encoded document bytes
+DOC_STORE = DocumentStore([OUTPUT_DIR, INPUT_DIR])
+# BM25 indexes over each document's OCR text (<output>.text.json from the translator)
+DOC_INDEX = DocumentIndexCache()
+# Answers to first questions, shared by every session asking about the same document
+ANSWER_CACHE = AnswerCache()
+
 
 class ChatRequest(BaseModel):
     message: str
     image_filename: Optional[str] = None          # optional: specific file
     source: Optional[str] = "output"              # "output" or "input"
     target_lang: Optional[str] = "auto"           # e.g., "bn", "es", "ar", or "auto"
+    session_id: Optional[str] = None              # from a previous reply; omitted on the first turn
 
 
-def _latest_image(folder: Path) -> Path:
-    candidates = []
-    for ext in ("*.png", "*.jpg", "*.jpeg", "*.webp"):
-        candidates.extend(folder.glob(ext))
-    if not candidates:
-        raise FileNotFoundError(f"No images found in {folder}")
-    # newest by modified time
-    return max(candidates, key=lambda p: p.stat().st_mtime)
-
-
-def _load_image_bytes(path: Path) -> tuple[bytes, str]:
-    # ensure it's a valid image and grab a mime
-    with Image.open(path) as im:
-        buf = io.BytesIO()
-        fmt = (im.format or "PNG").upper()  # Preserve format if possible
-        im.save(buf, fmt)
-        data = buf.getvalue()
-        mime = {
-            "PNG": "image/png",
-            "JPG": "image/jpeg",
-            "JPEG": "image/jpeg",
-            "WEBP": "image/webp"
-        }.get(fmt, "image/png")
-        return data, mime
-
-
-def _resolve_lang(user_msg: str, preferred: Optional[str], user_id: str) -> str:
+class ChatTurn(NamedTuple):
+    session_id: str
+    session: Session      # including this turn's question
+    img_path: Path
+    target_lang: str
+    messages: list
+    cache_key: Optional[AnswerKey]  # None when the answer depends on earlier turns
+    cached_reply: Optional[str]
+
+
+def _resolve_lang(user_msg: str, preferred: Optional[str], session_lang: Optional[str]) -> str:
     if preferred and preferred.lower() != "auto":
-        lang = preferred.lower()
-        SESSION_LANG[user_id] = lang
-        return lang
+        return preferred.lower()
 
-    if user_id in SESSION_LANG and SESSION_LANG[user_id] != "en":
-        return SESSION_LANG[user_id]
+    if session_lang and session_lang != "en":
+        return session_lang
 
-    try:
-        lang = detect(user_msg).lower()
-        SESSION_LANG[user_id] = lang
-        return lang
-    except Exception as e:
-        logger.warning(f"Language detection failed for '{user_msg}': {e}")
+    lang = lang_id.identify(user_msg)
+    if lang is None:
+        logger.info(f"Could not identify the language of '{user_msg}'; using en")
         return "en"
+    return lang
 
 
 def gemini_generate(messages: list[str]) -> str:
@@ -111,66 +107,178 @@ def gemini_generate(messages: list[str]) -> str:
         "contents": [{"parts": [{"text": "\n".join(messages)}]}]
     }
     try:
-        resp = requests.post(url, headers=headers, json=data)
+        resp = http_client.post(url, headers=headers, json=data)
         resp.raise_for_status()
         out = resp.json()
         return out["candidates"][0]["content"]["parts"][0]["text"]
     except Exception as e:
         logger.error(f"Gemini REST call failed: {e} - {resp.text if 'resp' in locals() else ''}")
-        return "Sorry, I couldn't extract an answer from the document."
+        return GEMINI_FALLBACK_REPLY
 
 
-@app.post("/api/chat")
-def chat(req: ChatRequest):
-    user_id = "anon"
+async def gemini_stream(messages: list[str]):
+    """Yield answer text as Gemini generates it (streamGenerateContent over SSE)."""
+    url = f"{GEMINI_STREAM_URL}?alt=sse&key={GEMINI_KEY}"
+    data = {
+        "contents": [{"parts": [{"text": "\n".join(messages)}]}]
+    }
+    async with http_client.stream("POST", url, json=data) as resp:
+        if resp.status_code >= 400:
+            body = (await resp.aread()).decode("utf-8", "replace")
+            raise RuntimeError(f"HTTP {resp.status_code}: {body[:300]}")
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            chunk = json.loads(line[5:])
+            for candidate in chunk.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+
+
+def _prepare_turn(req: ChatRequest) -> ChatTurn:
+    """Pick the document and language, record the question and build the prompt."""
+    session_id = req.session_id if valid_session_id(req.session_id) else new_session_id()
+    session = SESSIONS.get(session_id)
     folder = OUTPUT_DIR if (req.source or "output").lower() == "output" else INPUT_DIR
     if req.image_filename:
         img_path = (folder / req.image_filename)
         if not img_path.exists():
             raise FileNotFoundError(f"{img_path} not found.")
     else:
-        img_path = _latest_image(folder)
+        img_path = DOC_STORE.latest(folder)
 
     current_doc = str(img_path.name)
-    if SESSION_DOC[user_id] != current_doc:
-        SESSION_HISTORY[user_id].clear()
-        SESSION_DOC[user_id] = current_doc
+    if session.doc != current_doc:
+        session = session._replace(doc=current_doc, history=())
 
-    img_bytes, mime = _load_image_bytes(img_path)
     user_q = (req.message or "").strip()
-    target_lang = _resolve_lang(user_q, req.target_lang, user_id)
+    target_lang = _resolve_lang(user_q, req.target_lang, session.lang)
 
     # System prompt
     system_instruction = (
-        "You are a careful assistant. Only answer using information visible in the image. "
+        "You are a careful assistant. Answer using the document text excerpts below. "
         f"Always respond in the user's language: {target_lang}. "
         "Use clear, simple wording and keep answers concise. "
         "If the user's question is general (not directly in the document), answer politely using your own knowledge, "
         "but clearly mark it as general information and not from the document."
     )
 
+    # A first question about this document can be answered from (and fill) the answer cache
+    cache_key = cached_reply = None
+    if session.history:
+        ANSWER_CACHE.bypass()
+    else:
+        cache_key = ANSWER_CACHE.key(DOC_STORE.digest(img_path), target_lang, user_q)
+        cached_reply = ANSWER_CACHE.get(cache_key)
+
     # Conversation history
-    history = SESSION_HISTORY[user_id]
-    history.append({"role": "user", "content": user_q})
+    session = session._replace(lang=target_lang).with_message("user", user_q)
 
-    # Flatten into messages for Gemini
+    # Flatten into messages for Gemini: instructions, relevant document text, history
     messages = [system_instruction]
-    for turn in history:
-        prefix = "User" if turn["role"] == "user" else "Assistant"
-        messages.append(f"{prefix}: {turn['content']}")
+    excerpts = _document_excerpts(img_path, user_q, target_lang)
+    if excerpts:
+        messages.append("Document text (most relevant excerpts):\n" + excerpts)
+    for role, content in session.history:
+        prefix = "User" if role == "user" else "Assistant"
+        messages.append(f"{prefix}: {content}")
+
+    return ChatTurn(session_id, session, img_path, target_lang, messages, cache_key, cached_reply)
 
-    reply = gemini_generate(messages).strip()
 
-    history.append({"role": "assistant", "content": reply})
-    SESSION_HISTORY[user_id] = history
+def _document_excerpts(img_path: Path, question: str, lang: str, k: int = TOP_K) -> str:
+    """Top-k chunks of the document's text for this question, as prompt lines."""
+    try:
+        index = DOC_INDEX.get(img_path, lang)
+    except Exception as e:
+        logger.warning(f"Could not index text for {img_path.name}: {e}")
+        return ""
+    if index is None:
+        return ""
+    return "\n".join(f"[page {chunk.page}] {chunk.text}" for _, chunk in index.search(question, k))
 
+
+def _finish_turn(turn: ChatTurn, reply: str) -> dict:
+    if turn.cache_key is not None and turn.cached_reply is None and reply != GEMINI_FALLBACK_REPLY:
+        ANSWER_CACHE.put(turn.cache_key, reply)
+    SESSIONS.put(turn.session_id, turn.session.with_message("assistant", reply))
     return {
         "reply": reply,
-        "image_used": str(img_path.name),
-        "target_lang": target_lang
+        "image_used": str(turn.img_path.name),
+        "target_lang": turn.target_lang,
+        "session_id": turn.session_id
     }
 
 
+@app.post("/api/chat")
+def chat(req: ChatRequest):
+    turn = _prepare_turn(req)
+    reply = turn.cached_reply or gemini_generate(turn.messages).strip()
+    return _finish_turn(turn, reply)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Same as /api/chat, but the answer is streamed as Server-Sent Events:
+    "token" events carry text as it is generated, then one "done" event
+    carries the full reply, image_used, target_lang and session_id. If the
+    streaming call fails before any text arrives, a single "error" event is
+    sent instead and the turn is not recorded, so the client can retry it
+    on /api/chat.
+    """
+    turn = await run_in_threadpool(_prepare_turn, req)
+
+    async def events():
+        if turn.cached_reply:
+            yield _sse("token", {"text": turn.cached_reply})
+            yield _sse("done", _finish_turn(turn, turn.cached_reply))
+            return
+        parts = []
+        try:
+            async for text in gemini_stream(turn.messages):
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            logger.error(f"Gemini streaming call failed: {e}")
+            if not parts:
+                yield _sse("error", {"detail": "streaming failed"})
+                return
+        reply = "".join(parts).strip()
+        if not reply:
+            reply = GEMINI_FALLBACK_REPLY
+            yield _sse("token", {"text": reply})
+        yield _sse("done", _finish_turn(turn, reply))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.on_event("startup")
+def _warm_lang_id():
+    lang_id.warm()
+
+
+@app.on_event("shutdown")
+async def _close_http_pool():
+    await http_client.aclose()
+
+
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/api/stats")
+def stats():
+    return {
+        "documents": DOC_STORE.stats(),
+        "text_index": DOC_INDEX.stats(),
+        "sessions": SESSIONS.stats(),
+        "answers": ANSWER_CACHE.stats(),
+    }
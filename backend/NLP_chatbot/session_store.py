@@ -0,0 +1,179 @@
+"""
+Per-client chat sessions: preferred language, current document and the
+last few messages.
+
+Sessions are keyed by an opaque id the client keeps and sends back with
+every turn. Records are small (each message is capped at
+SESSION_MESSAGE_CHARS, the history at SESSION_HISTORY_LEN messages) and
+the store is bounded: sessions idle for SESSION_TTL_SEC expire, and past
+SESSION_MAX the least recently used are dropped.
+
+SESSION_BACKEND picks the backend:
+  memory  one process only (the default)
+  sqlite  a WAL-mode SQLite file at SESSION_DB_PATH, shared by every
+          worker on the host, so any worker can serve any turn; by
+          default in the data directory (ALIBI_DATA_DIR, else
+          $XDG_DATA_HOME/alibi), not the source tree
+"""
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+DATA_DIR = os.getenv("ALIBI_DATA_DIR") or os.path.join(
+    os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), "alibi"
+)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(DATA_DIR, "sessions.sqlite3"))
+SESSION_TTL_SEC = float(os.getenv("SESSION_TTL_SEC", "7200"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_HISTORY_LEN = int(os.getenv("SESSION_HISTORY_LEN", "5"))
+SESSION_MESSAGE_CHARS = int(os.getenv("SESSION_MESSAGE_CHARS", "2000"))
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class Session(NamedTuple):
+    lang: Optional[str] = None
+    doc: Optional[str] = None
+    history: tuple = ()  # ((role, content), ...), oldest first; role is "user" or "assistant"
+
+    def with_message(self, role: str, content: str) -> "Session":
+        history = self.history + ((role, content[:SESSION_MESSAGE_CHARS]),)
+        return self._replace(history=history[-SESSION_HISTORY_LEN:])
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def valid_session_id(session_id: Optional[str]) -> bool:
+    return bool(session_id) and bool(_SESSION_ID.match(session_id))
+
+
+def _encode(session: Session) -> str:
+    return json.dumps([session.lang, session.doc, [list(m) for m in session.history]],
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode(data: str) -> Session:
+    lang, doc, history = json.loads(data)
+    return Session(lang, doc, tuple(tuple(m) for m in history))
+
+
+class MemorySessionStore:
+    def __init__(self, ttl_sec: float = SESSION_TTL_SEC, max_sessions: int = SESSION_MAX):
+        self.ttl = ttl_sec
+        self.max_sessions = max(1, max_sessions)
+        self.expired = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()  # id -> (Session, last_used), least recent first
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """The session's record, or an empty one if it is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return Session()
+            if entry[1] < now - self.ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                return Session()
+            return entry[0]
+
+    def put(self, session_id: str, session: Session):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (session, now)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def _evict(self, now: float):
+        # Least recent first, so expired sessions are always at the front
+        while self._sessions:
+            _, last_used = next(iter(self._sessions.values()))
+            if last_used >= now - self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+class SqliteSessionStore:
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_sec: float = SESSION_TTL_SEC,
+                 max_sessions: int = SESSION_MAX):
+        self.path = path
+        self.ttl = ttl_sec
+        self.max_sessions = max(1, max_sessions)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                   id TEXT PRIMARY KEY,
+                   data TEXT NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Session:
+        """The session's record, or an empty one if it is unknown or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE id=? AND last_used>=?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        return _decode(row[0]) if row else Session()
+
+    def put(self, session_id: str, session: Session):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                               (session_id, _encode(session), now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM sessions WHERE last_used<?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        if count > self.max_sessions:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE rowid IN (SELECT rowid FROM sessions ORDER BY last_used LIMIT ?)",
+                (count - self.max_sessions,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": count, "max_sessions": self.max_sessions}
+
+
+def open_session_store(backend: str = SESSION_BACKEND):
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r}; use 'memory' or 'sqlite'")
+    return MemorySessionStore()
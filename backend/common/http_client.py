@@ -0,0 +1,151 @@
+# http_client.py
+"""
+Shared outbound HTTP client for the translator (Flask) and chatbot (FastAPI).
+
+One pooled, keep-alive session per process, so repeated calls to the same
+host reuse warm TCP/TLS connections instead of paying a new handshake each
+time. Every call gets a (connect, read) timeout unless the caller passes
+one. With HTTP2=1 and httpx[http2] installed, an httpx client is used
+instead of requests; both expose the same response surface we rely on
+(status_code, headers, json(), text, raise_for_status()).
+
+The session is rebuilt after fork so prefork workers never share sockets.
+
+Async callers (the chatbot's streaming endpoint) use get_async_client(),
+a pooled httpx.AsyncClient with the same timeouts, and stream() for
+responses read incrementally. httpx is required only for these.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP2 = os.getenv("HTTP2", "0").lower() in ("1", "true", "yes")
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_client = None
+_client_pid = None
+_async_client = None
+_async_client_pid = None
+_lock = threading.Lock()
+
+
+def _legacy_httpx(httpx) -> bool:
+    """httpx 0.13 (pinned by googletrans) predates Limits, Timeout(connect=) and content=."""
+    return not hasattr(httpx, "Limits")
+
+
+def _httpx_timeout(httpx, connect: float, read: float):
+    if _legacy_httpx(httpx):
+        return httpx.Timeout(read, connect_timeout=connect)
+    return httpx.Timeout(read, connect=connect)
+
+
+def _httpx_client_kwargs(httpx) -> dict:
+    """Timeout and pool limits in the installed httpx's own terms."""
+    max_connections = HTTP_POOL_HOSTS * HTTP_POOL_SIZE
+    if _legacy_httpx(httpx):
+        limits = {"pool_limits": httpx.PoolLimits(max_connections=max_connections, max_keepalive=HTTP_POOL_SIZE)}
+    else:
+        limits = {"limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=HTTP_POOL_SIZE)}
+    return {"timeout": _httpx_timeout(httpx, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), **limits}
+
+
+def _build_http2_client():
+    try:
+        import httpx
+        import h2  # noqa: F401  (httpx needs it for http2=True)
+    except ImportError:
+        print("[WARN] HTTP2=1 but httpx[http2] is not installed; using HTTP/1.1 pool.")
+        return None
+    try:
+        return httpx.Client(http2=True, **_httpx_client_kwargs(httpx))
+    except Exception as e:
+        print(f"[WARN] HTTP2=1 but the httpx client could not be built ({e}); using HTTP/1.1 pool.")
+        return None
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_SIZE,
+        # Only connection setup is retried; request bodies are never replayed.
+        max_retries=Retry(total=None, connect=2, read=0, status=0, backoff_factor=0.2),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_client():
+    """The process-wide pooled client (requests.Session, or httpx.Client with HTTP2=1)."""
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = (_build_http2_client() if HTTP2 else None) or _build_session()
+            _client_pid = os.getpid()
+        return _client
+
+
+def request(method: str, url: str, timeout=DEFAULT_TIMEOUT, **kwargs):
+    client = get_client()
+    if isinstance(client, requests.Session):
+        return client.request(method, url, timeout=timeout, **kwargs)
+    import httpx
+    if isinstance(timeout, tuple):
+        timeout = _httpx_timeout(httpx, timeout[0], timeout[1])
+    if "data" in kwargs and isinstance(kwargs["data"], (str, bytes)) and not _legacy_httpx(httpx):
+        kwargs["content"] = kwargs.pop("data")
+    return client.request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get_async_client():
+    """The process-wide pooled httpx.AsyncClient; create and use it from the server's event loop."""
+    global _async_client, _async_client_pid
+    with _lock:
+        if _async_client is None or _async_client_pid != os.getpid():
+            try:
+                import httpx
+            except ImportError:
+                raise RuntimeError("async HTTP needs httpx (pip install httpx)")
+            _async_client = httpx.AsyncClient(http2=HTTP2 and _has_h2(), **_httpx_client_kwargs(httpx))
+            _async_client_pid = os.getpid()
+        return _async_client
+
+
+def _has_h2():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def stream(method: str, url: str, **kwargs):
+    """Async context manager yielding an httpx response whose body is read as it arrives."""
+    return get_async_client().stream(method, url, **kwargs)
+
+
+async def aclose():
+    """Close the async pool (call from the app's shutdown hook)."""
+    global _async_client
+    with _lock:
+        client, _async_client = _async_client, None
+    if client is not None and _async_client_pid == os.getpid():
+        await client.aclose()
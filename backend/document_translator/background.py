@@ -0,0 +1,89 @@
+# background.py
+"""
+Vectorized background-color estimation for OCR boxes.
+
+The page is converted to an RGBA array once per document. Every pixel is
+quantized to a histogram bin, the bins for all padded box regions are
+counted in a single np.bincount, and the dominant bin per box is turned
+back into a color by averaging the pixels that fell into it.
+"""
+import numpy as np
+
+MARGIN = 10
+QUANT_BITS = 4          # bits kept per channel -> 16 levels, 4096 bins
+DISCOLORATION = 40
+FALLBACK_COLOR = (255, 255, 255)
+
+
+def image_to_rgba_array(image) -> np.ndarray:
+    """HxWx4 uint8 view of the image, converted once per document."""
+    return np.asarray(image.convert("RGBA"))
+
+
+def _regions(text_boxes, width, height, margin):
+    """Clamped (x0, y0, x1, y1) padded crop per box, like Image.crop would use."""
+    regions = np.empty((len(text_boxes), 4), dtype=np.int64)
+    for i, (vertices, _) in enumerate(text_boxes):
+        xs = [x for x, _ in vertices]
+        ys = [y for _, y in vertices]
+        regions[i] = (min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
+    np.clip(regions[:, 0::2], 0, width, out=regions[:, 0::2])
+    np.clip(regions[:, 1::2], 0, height, out=regions[:, 1::2])
+    return regions
+
+
+def dominant_colors(rgba: np.ndarray, text_boxes, margin: int = MARGIN, bits: int = QUANT_BITS) -> np.ndarray:
+    """
+    Dominant opaque color around each box as an (N, 3) uint8 array aligned
+    to text_boxes. Boxes with no opaque pixels get FALLBACK_COLOR.
+    """
+    n = len(text_boxes)
+    out = np.empty((n, 3), dtype=np.uint8)
+    out[:] = FALLBACK_COLOR
+    if n == 0:
+        return out
+
+    height, width = rgba.shape[:2]
+    shift = 8 - bits
+    nbins = 1 << (3 * bits)
+    rgb = rgba[..., :3]
+    q = rgb >> shift
+    codes = (q[..., 0].astype(np.int32) << (2 * bits)) | (q[..., 1].astype(np.int32) << bits) | q[..., 2]
+    codes[rgba[..., 3] == 0] = nbins  # transparent pixels go to a discarded bin
+
+    regions = _regions(text_boxes, width, height, margin)
+    crops = [codes[y0:y1, x0:x1].ravel() for x0, y0, x1, y1 in regions]
+    sizes = np.fromiter((c.size for c in crops), dtype=np.int64, count=n)
+    if not sizes.any():
+        return out
+
+    box_idx = np.repeat(np.arange(n), sizes)
+    flat_codes = np.concatenate(crops)
+    counts = np.bincount(box_idx * (nbins + 1) + flat_codes, minlength=n * (nbins + 1))
+    counts = counts.reshape(n, nbins + 1)[:, :nbins]
+    winners = counts.argmax(axis=1)
+    has_opaque = counts[np.arange(n), winners] > 0
+
+    # Average the real colors that landed in each box's winning bin
+    pixels = np.concatenate([rgb[y0:y1, x0:x1].reshape(-1, 3) for x0, y0, x1, y1 in regions])
+    in_winner = flat_codes == winners[box_idx]
+    sel_idx = box_idx[in_winner]
+    sel_pixels = pixels[in_winner].astype(np.float64)
+    totals = np.bincount(sel_idx, minlength=n).astype(np.float64)
+    for ch in range(3):
+        sums = np.bincount(sel_idx, weights=sel_pixels[:, ch], minlength=n)
+        means = np.divide(sums, totals, out=np.zeros(n), where=totals > 0)
+        out[has_opaque, ch] = np.rint(means[has_opaque]).astype(np.uint8)
+    return out
+
+
+def add_discoloration(colors: np.ndarray, strength: int = DISCOLORATION) -> np.ndarray:
+    """Shift colours by strength and clip; pure white becomes (245, 245, 245)."""
+    shifted = np.clip(colors.astype(np.int16) + strength, 0, 255).astype(np.uint8)
+    shifted[(shifted == 255).all(axis=1)] = 245
+    return shifted
+
+
+def background_colors(rgba: np.ndarray, text_boxes, margin: int = MARGIN) -> np.ndarray:
+    """Fill colors for every box, aligned to text_boxes."""
+    return add_discoloration(dominant_colors(rgba, text_boxes, margin))
@@ -0,0 +1,196 @@
+# batch.py
+"""
+Folder batch mode for the document translator (python main.py ...).
+
+Files are spread over a pool of worker processes, each holding its own
+OCR client. With the Google Vision engine, images are sent in groups
+through multi-image annotate calls. Every finished file is appended to a
+JSON-lines manifest keyed by (sha256 of the input, target language), so an
+interrupted run picks up where it left off instead of starting over.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+MANIFEST_NAME = ".batch-manifest.jsonl"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    """(sha256, lang) -> entry for every file already completed."""
+    done = {}
+    if not os.path.isfile(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted run
+            done[(entry["sha256"], entry["lang"])] = entry
+    return done
+
+
+def _init_worker():
+    import main
+    main.routing_table()
+    if main.OCR_ENGINE == "google":
+        main.vision_client()
+
+
+def _translate_group(items):
+    """
+    Worker task. items is [(input_path, {lang: output_path}), ...]; returns
+    [(input_path, lang, error or None), ...]. Every language of a file is
+    rendered from one OCR pass.
+    """
+    import main
+    import multipage
+
+    results = []
+    images = [(i, o) for i, o in items if os.path.splitext(i)[1].lower() in IMAGE_EXTENSIONS]
+    documents = [(i, o) for i, o in items if os.path.splitext(i)[1].lower() not in IMAGE_EXTENSIONS]
+
+    boxes = [None] * len(images)
+    if main.OCR_ENGINE == "google" and len(images) > 1:
+        try:
+            boxes = main.perform_ocr_batch_google_vision([i for i, _ in images])
+        except Exception as e:
+            print(f"[WARN] Batch OCR failed, falling back to per-image calls: {e}")
+
+    for (input_path, outputs), text_boxes in zip(images, boxes):
+        try:
+            translated = main.translate_image_multi(input_path, list(outputs), main.LANGUAGE_FONT_MAP,
+                                                    text_boxes=text_boxes)
+            for lang, output_path in outputs.items():
+                translated[lang].save(output_path)
+                results.append((input_path, lang, None))
+        except Exception as e:
+            results.extend((input_path, lang, str(e)) for lang in outputs)
+
+    for input_path, outputs in documents:
+        try:
+            with open(input_path, "rb") as f:
+                data = f.read()
+            # PDF appends re-read the file, hence "w+b"
+            fps = {lang: open(output_path, "w+b") for lang, output_path in outputs.items()}
+            try:
+                multipage.translate_document_multi(data, list(outputs), fps, workers=1)
+            finally:
+                for fp in fps.values():
+                    fp.close()
+            results.extend((input_path, lang, None) for lang in outputs)
+        except Exception as e:
+            results.extend((input_path, lang, str(e)) for lang in outputs)
+    return results
+
+
+def output_path_for(output_folder, filename, lang, multi):
+    stem, ext = os.path.splitext(filename)
+    suffix = f"-translated-{lang}" if multi else "-translated"
+    return os.path.join(output_folder, f"{stem}{suffix}{ext}")
+
+
+def run_batch(input_folder, output_folder, target_langs, workers=1, group_size=8, manifest_path=None, resume=True):
+    """
+    target_langs is a language code or a list of them; with several, outputs
+    are named <stem>-translated-<lang><ext>.
+    """
+    import multipage
+
+    if isinstance(target_langs, str):
+        target_langs = [target_langs]
+    target_langs = list(dict.fromkeys(target_langs))
+    multi = len(target_langs) > 1
+    manifest_path = manifest_path or os.path.join(output_folder, MANIFEST_NAME)
+    os.makedirs(output_folder, exist_ok=True)
+    done = load_manifest(manifest_path) if resume else {}
+
+    extensions = IMAGE_EXTENSIONS + tuple(multipage.DOCUMENT_EXTENSIONS)
+    todo, hashes, skipped, outputs_total = [], {}, 0, 0
+    for filename in sorted(os.listdir(input_folder)):
+        if not filename.lower().endswith(extensions):
+            continue
+        input_path = os.path.join(input_folder, filename)
+        digest = file_sha256(input_path)
+        outputs = {}
+        for lang in target_langs:
+            entry = done.get((digest, lang))
+            if entry and os.path.isfile(entry.get("output", "")):
+                skipped += 1
+                continue
+            outputs[lang] = output_path_for(output_folder, filename, lang, multi)
+        if not outputs:
+            continue
+        hashes[input_path] = digest
+        todo.append((input_path, outputs))
+        outputs_total += len(outputs)
+
+    print(f"[INFO] {outputs_total} output(s) from {len(todo)} file(s) to translate, "
+          f"{skipped} already done per {manifest_path}.")
+    if not todo:
+        return
+
+    # Don't let large groups leave workers idle on small runs
+    group_size = max(1, min(group_size, -(-len(todo) // max(1, workers))))
+    groups = [todo[i:i + group_size] for i in range(0, len(todo), group_size)]
+    outputs_by_file = dict(todo)
+    completed = failed = 0
+    with open(manifest_path, "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=max(1, workers), initializer=_init_worker) as pool:
+        futures = [pool.submit(_translate_group, group) for group in groups]
+        for future in as_completed(futures):
+            for input_path, lang, error in future.result():
+                if error:
+                    failed += 1
+                    print(f"[WARN] {os.path.basename(input_path)} ({lang}) failed: {error}")
+                    continue
+                completed += 1
+                output_path = outputs_by_file[input_path][lang]
+                manifest.write(json.dumps({
+                    "sha256": hashes[input_path], "lang": lang, "file": os.path.basename(input_path),
+                    "output": output_path, "finished": time.time(),
+                }) + "\n")
+                manifest.flush()
+                print(f"[INFO] [{completed + failed}/{outputs_total}] Saved as {output_path}")
+    print(f"[INFO] Batch finished: {completed} translated, {failed} failed, {skipped} skipped.")
+
+
+def main(argv=None):
+    import main as translator
+
+    parser = argparse.ArgumentParser(description="Translate every image/document in a folder.")
+    parser.add_argument("target_lang", nargs="?", default="en",
+                        help="target language, or several comma-separated (e.g. es,fr) sharing one OCR pass")
+    parser.add_argument("--input", default="input", help="input folder (default: input)")
+    parser.add_argument("--output", default="output", help="output folder (default: output)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--group-size", type=int, default=8,
+                        help="images per worker task / multi-image OCR call")
+    parser.add_argument("--manifest", help=f"manifest path (default: <output>/{MANIFEST_NAME})")
+    parser.add_argument("--no-resume", action="store_true", help="ignore the manifest and redo every file")
+    args = parser.parse_args(argv)
+    target_langs = [code.strip() for code in args.target_lang.split(",") if code.strip()] or ["en"]
+
+    if translator.AZ_T_ENDPOINT and translator.AZ_T_KEY and translator.AZ_T_REGION:
+        print("[INFO] Azure Translator configured.")
+    else:
+        print("[INFO] Azure not configured. Will use other providers if available.")
+    if translator.DEEPL_API_KEY:
+        print("[INFO] DeepL configured.")
+    else:
+        print("[INFO] DeepL not configured.")
+
+    run_batch(args.input, args.output, target_langs, workers=args.workers,
+              group_size=max(1, args.group_size), manifest_path=args.manifest, resume=not args.no_resume)
@@ -0,0 +1,94 @@
+# clean_plate.py
+"""
+The "clean plate": a source image with its text regions already erased.
+
+A plate holds the erased image plus everything needed to draw on it again:
+box geometry, the cleaned source text per box, the fill colour used for
+each box and the original pixels under it (put back when a language leaves
+a box untranslated). Rendering a language is then just rasterizing text on
+a copy of the plate, so switching languages doesn't re-open, re-sample or
+repaint the source.
+
+Plates are kept in a per-process LRU (PLATE_CACHE_SIZE) keyed like the OCR
+cache, by image content.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from PIL import ImageDraw
+
+import background
+
+PLATE_CACHE_SIZE = int(os.getenv("PLATE_CACHE_SIZE", "16"))
+
+
+class CleanPlate(NamedTuple):
+    image: object   # erased PIL image; never drawn on directly
+    boxes: list     # [(vertices, text), ...] as OCR'd
+    texts: list     # cleaned source text per box, "" for boxes left alone
+    colors: list    # RGB fill per box, None where nothing was erased
+    patches: list   # original pixels per erased box, None elsewhere
+
+
+def bounds(vertices):
+    xs = [x for x, _ in vertices]
+    ys = [y for _, y in vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def build_plate(image, text_boxes, texts) -> CleanPlate:
+    """Erase every box whose text is non-empty, in its sampled background colour."""
+    plate = image.copy()
+    erase = [bool(t) for t in texts]
+    targets = [box for box, flag in zip(text_boxes, erase) if flag]
+    sampled = iter(background.background_colors(background.image_to_rgba_array(image), targets)) if targets else iter(())
+    draw = ImageDraw.Draw(plate)
+    colors, patches = [], []
+    for (vertices, _), flag in zip(text_boxes, erase):
+        if not flag:
+            colors.append(None)
+            patches.append(None)
+            continue
+        color = tuple(int(c) for c in next(sampled))
+        x_min, y_min, x_max, y_max = bounds(vertices)
+        patches.append(image.crop((x_min, y_min, x_max + 1, y_max + 1)))
+        draw.rectangle(((x_min, y_min), (x_max, y_max)), fill=color)
+        colors.append(color)
+    return CleanPlate(plate, list(text_boxes), [t or "" for t in texts], colors, patches)
+
+
+class PlateCache:
+    def __init__(self, max_entries: int = PLATE_CACHE_SIZE):
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._plates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            plate = self._plates.get(key)
+            if plate is None:
+                self.misses += 1
+                return None
+            self._plates.move_to_end(key)
+            self.hits += 1
+            return plate
+
+    def put(self, key, plate):
+        with self._lock:
+            self._plates[key] = plate
+            self._plates.move_to_end(key)
+            while len(self._plates) > self.max_entries:
+                self._plates.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._plates),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,82 @@
+# font_registry.py
+"""
+Process-wide cache of FreeType faces keyed by (font file, size).
+
+Each font file is read from disk once; every size of that face is built
+from the same immutable bytes object (Pillow keeps a reference instead of
+copying it), so a 20 MB CJK face costs 20 MB no matter how many sizes are
+in use. Built faces live in a bounded LRU.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import ImageFont
+
+DEFAULT_FONT = 'NotoSans-Regular.ttf'
+
+
+class FontRegistry:
+    def __init__(self, font_dir: str, max_faces: int = 256):
+        self.font_dir = font_dir
+        self.max_faces = max_faces
+        self._faces = OrderedDict()   # (font_file, size) -> FreeTypeFont
+        self._bytes = {}              # font_file -> bytes, or None if missing
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _face_bytes(self, font_file: str):
+        if font_file not in self._bytes:
+            path = os.path.join(self.font_dir, font_file)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    self._bytes[font_file] = f.read()
+            else:
+                print(f"[WARN] Font file not found: {font_file}, using default.")
+                self._bytes[font_file] = None
+        return self._bytes[font_file]
+
+    def get(self, font_file: str, size: int):
+        """Return the face for (font_file, size), loading it on a miss."""
+        key = (font_file, size)
+        with self._lock:
+            font = self._faces.get(key)
+            if font is not None:
+                self._faces.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+            data = self._face_bytes(font_file)
+            if data is None:
+                return ImageFont.load_default()
+            font = ImageFont.truetype(io.BytesIO(data), size)
+            self._faces[key] = font
+            if len(self._faces) > self.max_faces:
+                self._faces.popitem(last=False)
+                self.evictions += 1
+            return font
+
+    def preload(self, font_files, sizes=()):
+        """Read the given faces into memory and optionally build some sizes."""
+        for font_file in font_files:
+            with self._lock:
+                self._face_bytes(font_file)
+            for size in sizes:
+                self.get(font_file, size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "faces": len(self._faces),
+                "max_faces": self.max_faces,
+                "files_loaded": sorted(f for f, b in self._bytes.items() if b is not None),
+                "bytes_loaded": sum(len(b) for b in self._bytes.values() if b is not None),
+            }
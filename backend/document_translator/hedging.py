@@ -0,0 +1,165 @@
+# hedging.py
+"""
+Hedged translation requests (PROVIDER_HEDGING=1).
+
+Pending texts are split into chunks that go to the primary provider
+concurrently. A chunk the primary hasn't answered by its deadline (the
+primary's observed p95 chunk latency times HEDGE_P95_FACTOR, or
+HEDGE_DEFAULT_DEADLINE until enough samples exist) is also sent to the
+backup provider, and the first acceptable answer for each text wins. The
+slower request is left to finish in the background; its answer is dropped.
+Backup calls run in their own thread pool, so they never queue behind the
+slow primaries they are meant to route around.
+
+Hedging is capped so it can't double the bill: hedged characters may not
+exceed HEDGE_BUDGET times the characters sent to primaries (plus a small
+HEDGE_BURST_CHARS allowance so the first slow chunk of a fresh process can
+hedge). Without budget, a late chunk simply keeps waiting on the primary.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+HEDGE_ENABLED = os.getenv("PROVIDER_HEDGING", "0").lower() in ("1", "true", "yes")
+HEDGE_CHUNK = int(os.getenv("HEDGE_CHUNK", "20"))
+HEDGE_P95_FACTOR = float(os.getenv("HEDGE_P95_FACTOR", "1.0"))
+HEDGE_DEFAULT_DEADLINE = float(os.getenv("HEDGE_DEFAULT_DEADLINE", "5"))
+HEDGE_MIN_DEADLINE = 0.5
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+HEDGE_BURST_CHARS = int(os.getenv("HEDGE_BURST_CHARS", "2000"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "8"))
+MIN_SAMPLES = 10
+LATENCY_WINDOW = 200
+
+
+class HedgeBudget:
+    def __init__(self, fraction: float = HEDGE_BUDGET, burst: int = HEDGE_BURST_CHARS):
+        self.fraction = fraction
+        self.burst = burst
+        self.primary_chars = 0
+        self.hedged_chars = 0
+        self.hedges = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def sent(self, chars: int):
+        with self._lock:
+            self.primary_chars += chars
+
+    def take(self, chars: int) -> bool:
+        with self._lock:
+            if self.hedged_chars + chars > self.fraction * self.primary_chars + self.burst:
+                self.denied += 1
+                return False
+            self.hedged_chars += chars
+            self.hedges += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "primary_chars": self.primary_chars,
+                "hedged_chars": self.hedged_chars,
+                "hedges": self.hedges,
+                "denied": self.denied,
+            }
+
+
+BUDGET = HedgeBudget()
+_chunk_latency = {}   # provider -> deque of chunk durations (s)
+_latency_lock = threading.Lock()
+_pools = {}           # "primary"/"backup" -> (pid, executor)
+_pool_lock = threading.Lock()
+
+
+def _executor(role):
+    with _pool_lock:
+        pool = _pools.get(role)
+        if pool is None or pool[0] != os.getpid():
+            pool = _pools[role] = (os.getpid(), ThreadPoolExecutor(max_workers=HEDGE_WORKERS,
+                                                                   thread_name_prefix=f"hedge-{role}"))
+        return pool[1]
+
+
+def _observe(provider, seconds):
+    with _latency_lock:
+        _chunk_latency.setdefault(provider, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def deadline_for(provider) -> float:
+    with _latency_lock:
+        samples = sorted(_chunk_latency.get(provider, ()))
+    if len(samples) < MIN_SAMPLES:
+        return HEDGE_DEFAULT_DEADLINE
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return max(HEDGE_MIN_DEADLINE, p95 * HEDGE_P95_FACTOR)
+
+
+def _timed(run, provider, batch):
+    start = time.monotonic()
+    out = run(provider, batch)
+    _observe(provider, time.monotonic() - start)
+    return out
+
+
+def _hedge_chunk(batch, primary, backup, run, acceptable):
+    """[(translation, provider) or None] for one chunk, and whether the backup answered it."""
+    chars = sum(len(t) for t in batch)
+    BUDGET.sent(chars)
+    futures = {_executor("primary").submit(_timed, run, primary, batch): primary}
+    done, _ = wait(futures, timeout=deadline_for(primary))
+    if not done and BUDGET.take(chars):
+        print(f"[INFO] {primary} is past its deadline; hedging {len(batch)} text(s) to {backup}")
+        futures[_executor("backup").submit(_timed, run, backup, batch)] = backup
+
+    picked = [None] * len(batch)
+    backup_answered = False
+    pending = set(futures)
+    while pending and any(p is None for p in picked):
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                outs = future.result()
+            except Exception as e:
+                print(f"[WARN] {futures[future]} failed for a hedged chunk: {e}")
+                continue
+            backup_answered = backup_answered or futures[future] == backup
+            for j, src in enumerate(batch):
+                cand = outs[j] if j < len(outs) else ""
+                if picked[j] is None and acceptable(src, cand):
+                    picked[j] = (cand, futures[future])
+    return picked, backup_answered
+
+
+def translate_hedged(texts, primary, backup, run, acceptable, backup_tried=None):
+    """
+    Translate texts with primary, hedging late chunks to backup. Returns a
+    list aligned to texts of (translation, provider), or None where neither
+    produced an acceptable answer. If backup_tried is a set it receives the
+    indices of texts the backup already answered, so the caller doesn't
+    send (and pay for) them again.
+    """
+    chunks = [texts[i:i + HEDGE_CHUNK] for i in range(0, len(texts), HEDGE_CHUNK)]
+    if len(chunks) == 1:
+        results = [_hedge_chunk(chunks[0], primary, backup, run, acceptable)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(HEDGE_WORKERS, len(chunks))) as chunk_pool:
+            results = list(chunk_pool.map(lambda c: _hedge_chunk(c, primary, backup, run, acceptable), chunks))
+    picked = []
+    for picks, backup_answered in results:
+        if backup_answered and backup_tried is not None:
+            backup_tried.update(range(len(picked), len(picked) + len(picks)))
+        picked.extend(picks)
+    return picked
+
+
+def stats() -> dict:
+    with _latency_lock:
+        providers = list(_chunk_latency)
+    return {
+        "enabled": HEDGE_ENABLED,
+        **BUDGET.stats(),
+        "deadlines": {p: deadline_for(p) for p in providers},
+    }
@@ -0,0 +1,391 @@
+# jobs.py
+"""
+Asynchronous document-translation jobs.
+
+Submissions go into a bounded queue served by a fixed set of long-lived
+worker processes, so the HTTP thread only enqueues and returns a job id.
+A full queue is rejected (QueueFull -> HTTP 429) instead of growing
+without bound. Each worker runs one job at a time; a job that overruns
+its timeout or is cancelled while running has its worker, and any page
+or OCR pool the worker started, terminated and replaced, so a stuck
+OCR/provider call cannot hold a slot forever. Finished results are kept
+in the parent for JOB_RESULT_TTL seconds.
+
+Workers import the modules in JOB_PRELOAD (through the forkserver when
+it can see them) before taking a job, so they start warm; they never
+re-run the server script's warm-up.
+
+A handler is called as handler(payload, progress) in the worker and may
+call progress(info_dict, page=(index, png_bytes)) to publish partial
+results; info is merged into the job's status and pages are kept so they
+can be served before the job finishes. progress(..., context=dict) merges
+into the job's private context instead (e.g. the document text).
+"""
+import atexit
+import importlib
+import io
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "180"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+# Workers start from a clean, single-threaded forkserver rather than a fork
+# of the threaded server, which would inherit its pools, SQLite connections
+# and any lock another thread holds at that moment.
+JOB_START_METHOD = os.getenv(
+    "JOB_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+# Imported by every worker before its first job; the forkserver loads them once for all
+JOB_PRELOAD = tuple(m for m in os.getenv("JOB_PRELOAD", "main,multipage").split(",") if m)
+# Jobs live in the server process that accepted them; turn /jobs off (JOB_API=0)
+# to run several server processes behind one port. serve.py defaults it to off.
+JOB_API = os.getenv("JOB_API", "1").lower() in ("1", "true", "yes")
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, TIMED_OUT = (
+    "queued", "running", "done", "failed", "cancelled", "timed_out"
+)
+FINISHED = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, payload, timeout, context=None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.context = context or {}  # caller data kept in the parent, never reported
+        self.timeout = timeout
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.meta = {}                # extra public fields for the status response
+        self.pages = {}               # page index -> PNG bytes, for multi-page progress
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            **self.meta,
+        }
+
+
+def translate_job(payload, progress=None):
+    """
+    Default handler: payload {'image': bytes, 'target_lang': str} -> PNG bytes,
+    or a PDF/TIFF of the same kind for multi-page documents (with per-page
+    progress reported as each page finishes). The document text is passed
+    back as context["pages"].
+    """
+    import main
+    import multipage
+    lang = payload["target_lang"]
+    if not multipage.detect_document_type(payload["image"]):
+        texts = {}
+        png = main.translate_to_pngs(payload["image"], [lang], texts_out=texts)[lang]
+        if progress:
+            progress({}, context={"pages": [texts]})
+        return png
+
+    done = []
+
+    def on_page(index, total, png, error):
+        done.append(index)
+        if progress:
+            progress({"pages_total": total, "pages_done": len(done)}, page=(index, png))
+
+    out = io.BytesIO()
+    page_texts = {}
+    multipage.translate_document(payload["image"], lang, out, on_page=on_page, page_texts=page_texts)
+    if progress:
+        progress({}, context={"pages": [page_texts[i] for i in sorted(page_texts)]})
+    return out.getvalue()
+
+
+def _worker_main(conn, handler, preload=()):
+    # With JOB_START_METHOD=fork we inherit the server worker's SIGTERM/SIGINT
+    # handlers (see serve.py), which would make terminate() a no-op; use the defaults.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # page and OCR pools join our group, so kill() can stop them too
+    for name in preload:
+        importlib.import_module(name)  # no-op when the forkserver already has it
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        job_id, payload = msg
+
+        def progress(info, page=None, context=None):
+            conn.send(("progress", job_id, info, page, context))
+
+        try:
+            conn.send(("result", job_id, True, handler(payload, progress)))
+        except Exception:
+            conn.send(("result", job_id, False, traceback.format_exc(limit=5)))
+
+
+class _Worker:
+    def __init__(self, ctx, handler, preload=()):
+        self.conn, child_conn = ctx.Pipe()
+        # Not a daemon: multi-page jobs start their own page pool.
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, handler, preload), daemon=False)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+
+    def kill(self):
+        """Stop the worker and every process it started (its page and OCR pools)."""
+        self._signal_group(signal.SIGTERM)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self._signal_group(getattr(signal, "SIGKILL", signal.SIGTERM))
+            self.process.join(timeout=5)
+        self.conn.close()
+
+    def _signal_group(self, sig):
+        if not hasattr(os, "killpg"):
+            self.process.terminate()
+            return
+        try:
+            os.killpg(self.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            self.process.terminate()  # setpgrp() has not run yet, or the group is gone
+
+
+def _forkserver_preload(ctx, preload):
+    """
+    Have the forkserver import preload once so every worker forks from it warm.
+    The forkserver resolves names from the current directory only (it ignores
+    sys.path), so this is skipped unless that is this folder: from the repo
+    root "main" would be the launcher, not the translator.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    if ctx.get_start_method() == "forkserver" and preload and os.path.samefile(os.getcwd(), here):
+        ctx.set_forkserver_preload(list(preload))
+
+
+class JobQueue:
+    def __init__(self, handler=translate_job, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE,
+                 timeout: float = JOB_TIMEOUT, result_ttl: float = JOB_RESULT_TTL, on_done=None,
+                 preload=JOB_PRELOAD):
+        self.handler = handler
+        self.preload = tuple(preload)
+        self.timeout = timeout
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.on_done = on_done
+        self._ctx = multiprocessing.get_context(JOB_START_METHOD)
+        _forkserver_preload(self._ctx, self.preload)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queue = deque()
+        # Filled under the lock, drained by _settle() once it is released
+        self._retired = []    # replaced workers still to be killed
+        self._completed = []  # (job, result) still to go through on_done
+        self._workers = [_Worker(self._ctx, handler, self.preload) for _ in range(max(1, workers))]
+        self._wake_r, self._wake_w = self._ctx.Pipe(duplex=False)
+        self._closed = False
+        self.counts = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0, CANCELLED: 0, TIMED_OUT: 0}
+        self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    # Public API
+    def submit(self, payload, timeout: float = None, context: dict = None, meta: dict = None) -> Job:
+        with self._lock:
+            if len(self._queue) >= self.max_queued:
+                self.counts["rejected"] += 1
+                raise QueueFull(f"{len(self._queue)} jobs already waiting")
+            job = Job(payload, timeout or self.timeout, context)
+            job.meta.update(meta or {})
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self.counts["submitted"] += 1
+        self._wake()
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if unknown or already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.status in FINISHED:
+                return False
+            if job.status == QUEUED:
+                self._queue.remove(job)
+                self._finish(job, CANCELLED)
+                return True
+            for i, worker in enumerate(self._workers):
+                if worker.job is job:
+                    self._replace_worker(i)
+            self._finish(job, CANCELLED)
+        self._wake()
+        return True
+
+    def idle(self) -> bool:
+        """True when no job is queued, running or keeping a result for its client."""
+        with self._lock:
+            return not self._jobs
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "busy": sum(1 for w in self._workers if w.job),
+                "queued": len(self._queue),
+                "max_queued": self.max_queued,
+                **self.counts,
+            }
+
+    def shutdown(self):
+        self._closed = True
+        self._wake()
+        self._thread.join(timeout=5)
+        self._settle()
+        for worker in self._workers:
+            worker.kill()
+
+    # Dispatcher
+    def _wake(self):
+        try:
+            self._wake_w.send_bytes(b"")
+        except OSError:
+            pass
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.finished = time.time()
+        job.result = result
+        job.error = error
+        job.payload = None  # drop the upload as soon as it is no longer needed
+        self.counts[status] += 1
+        job.context = {}
+
+    def _replace_worker(self, i):
+        self._retired.append(self._workers[i])
+        self._workers[i] = _Worker(self._ctx, self.handler, self.preload)
+
+    def _settle(self):
+        """
+        Kill replaced workers and run on_done for finished jobs, outside the
+        lock: kill() can wait 10s and on_done writes to disk, and neither may
+        hold up status polls. A job stays RUNNING until its hook has run, so
+        clients never see DONE before its artifacts exist.
+        """
+        with self._lock:
+            retired, self._retired = self._retired, []
+            completed, self._completed = self._completed, []
+        for worker in retired:
+            worker.kill()
+        for job, value in completed:
+            if self.on_done:
+                job.result = value
+                try:
+                    self.on_done(job)
+                except Exception as e:
+                    print(f"[WARN] job {job.id} on_done hook failed: {e}")
+            with self._lock:
+                if job.status == RUNNING:  # not cancelled meanwhile
+                    self._finish(job, DONE, result=value)
+
+    def _assign(self):
+        for i, worker in enumerate(self._workers):
+            if not self._queue:
+                return
+            if worker.job is None:
+                job = self._queue.popleft()
+                try:
+                    worker.conn.send((job.id, job.payload))
+                except OSError:
+                    self._queue.appendleft(job)  # worker is gone; retry on its replacement
+                    self._replace_worker(i)
+                    continue
+                job.status = RUNNING
+                job.started = time.time()
+                worker.job = job
+
+    def _reap(self, now):
+        for i, worker in enumerate(self._workers):
+            job = worker.job
+            if job and now - job.started > job.timeout:
+                self._replace_worker(i)
+                self._finish(job, TIMED_OUT, error=f"exceeded {job.timeout:g}s")
+        expired = [jid for jid, j in self._jobs.items()
+                   if j.status in FINISHED and now - j.finished > self.result_ttl]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def _collect(self, worker, i):
+        try:
+            msg = worker.conn.recv()
+        except (EOFError, OSError):
+            job = worker.job
+            self._replace_worker(i)
+            if job and job.status == RUNNING:
+                self._finish(job, FAILED, error="worker process died")
+            return
+        job = worker.job
+        if job is None or job.id != msg[1] or job.status != RUNNING:
+            if msg[0] == "result":
+                worker.job = None
+            return  # cancelled or timed out while the message was in flight
+        if msg[0] == "progress":
+            _, _, info, page, context = msg
+            job.meta.update(info)
+            job.context.update(context or {})
+            if page and page[1] is not None:
+                job.pages[page[0]] = page[1]
+            return
+        _, _, ok, value = msg
+        worker.job = None
+        if ok:
+            self._completed.append((job, value))
+        else:
+            self._finish(job, FAILED, error=value)
+
+    def _run(self):
+        while not self._closed:
+            with self._lock:
+                self._assign()
+                busy = {w.conn: i for i, w in enumerate(self._workers) if w.job}
+            try:
+                ready = wait(list(busy) + [self._wake_r], timeout=1.0)
+            except OSError:
+                ready = []  # a worker was replaced under us; re-scan
+            with self._lock:
+                for conn in ready:
+                    if conn is self._wake_r:
+                        while self._wake_r.poll():
+                            self._wake_r.recv_bytes()
+                        continue
+                    i = busy[conn]
+                    if self._workers[i].conn is conn:
+                        self._collect(self._workers[i], i)
+                self._reap(time.time())
+            self._settle()
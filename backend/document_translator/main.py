@@ -1,20 +1,28 @@
 # main.py
-from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageEnhance
-from googletrans import Translator as GoogleTranslator
-from googletrans import LANGUAGES as GT_LANGUAGES  # for support check
+from PIL import Image, ImageDraw, ImageOps
 from font_map import LANGUAGE_FONT_MAP
-from spellchecker import SpellChecker
+from font_registry import FontRegistry, DEFAULT_FONT
+from text_fit import fit_text, REFERENCE_SIZE
+import background
+from translation_memory import TranslationMemory, TM_PATH
+from provider_dispatch import dispatch, RateLimited, parse_retry_after
+import provider_health
+import hedging
+from segmentation import OcrBoxes, segment_boxes, SEGMENT_LEVEL
+from ocr_cache import OcrCache, content_key
+from clean_plate import CleanPlate, PlateCache, build_plate
+import startup
 from functools import lru_cache
-from google.cloud import vision
 import unicodedata
-import wordninja
-import requests
 import json
-import time
-import deepl
+import io
 import sys
 import os
 
+# Shared backend helpers (backend/common)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+import http_client
+
 # Paths & env
 FONT_DIR = os.path.join(os.path.dirname(__file__), "Noto")
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r"C:\Users\Aishik C\Desktop\vision_key.json"
@@ -23,6 +31,14 @@ AZ_T_ENDPOINT = os.getenv("AZURE_TRANSLATOR_ENDPOINT", "").rstrip("/")
 AZ_T_KEY = os.getenv("AZURE_TRANSLATOR_KEY")
 AZ_T_REGION = os.getenv("AZURE_TRANSLATOR_REGION")
 DEEPL_API_KEY = os.getenv("DEEPL_API_KEY")
+PROVIDER_ROUTING = os.getenv("PROVIDER_ROUTING", "latency").lower()  # "latency" or "static"
+OCR_ENGINE = os.getenv("OCR_ENGINE", "google").lower()  # "google" or "tesseract"
+
+# Font cache sizing and the languages whose faces are loaded at startup
+FONT_CACHE_SIZE = int(os.getenv("FONT_CACHE_SIZE", "256"))
+FONT_PRELOAD_LANGS = [c.strip() for c in os.getenv("FONT_PRELOAD_LANGS", "").split(",") if c.strip()]
+
+FONT_REGISTRY = FontRegistry(FONT_DIR, max_faces=FONT_CACHE_SIZE)
 
 
 # Normalizers & helpers
@@ -87,19 +103,50 @@ def debug_text(text: str, lang_code: str, font_file: str):
     print(f"[DBG] cps={cps}")
     print(f"[DBG] names={names}")
 
+def open_image(source):
+    """PIL image from a path, raw bytes, file object or an existing image."""
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    image.load()
+    return image
+
+def image_bytes(source) -> bytes:
+    """Encoded bytes for engines that want the original file (Vision)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, Image.Image):
+        buf = io.BytesIO()
+        source.save(buf, format=source.format or "PNG")
+        return buf.getvalue()
+    if hasattr(source, "read"):
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
 def is_junk(text):
     return sum(1 for c in text if not c.isalnum() and c not in '.,:;!?') > len(text) * 0.4
 
 def get_font_by_lang(lang_code: str, size: int = 20):
-    font_name = LANGUAGE_FONT_MAP.get(lang_code, 'NotoSans-Regular.ttf')
-    font_path = os.path.join(FONT_DIR, font_name)
-    if os.path.isfile(font_path):
-        return ImageFont.truetype(font_path, size)
-    print(f"[WARN] Font not found for {lang_code} → {font_name}, using default.")
-    return ImageFont.load_default()
+    font_name = LANGUAGE_FONT_MAP.get(lang_code, DEFAULT_FONT)
+    return FONT_REGISTRY.get(font_name, size)
+
+def preload_fonts(lang_codes=None):
+    """Load the faces for the given (or configured) languages up front."""
+    lang_codes = FONT_PRELOAD_LANGS if lang_codes is None else lang_codes
+    font_files = {LANGUAGE_FONT_MAP.get(normalize_lang_code(c), DEFAULT_FONT) for c in lang_codes}
+    FONT_REGISTRY.preload(sorted(font_files), sizes=(REFERENCE_SIZE,))
+    print(f"[INFO] Preloaded {len(font_files)} font face(s) for {len(lang_codes)} language(s).")
 
 
 # Provider support discovery
+@lru_cache(maxsize=1)
+def google_supported_targets():
+    """googletrans language codes (imports googletrans)."""
+    return set(startup.lazy_import("googletrans").LANGUAGES)
+
 @lru_cache(maxsize=1)
 def azure_supported_targets():
     """Fetch Azure Translator supported targets once (empty if not configured)."""
@@ -107,7 +154,7 @@ def azure_supported_targets():
         return {}
     try:
         url = f"{AZ_T_ENDPOINT}/languages?api-version=3.0&scope=translation"
-        r = requests.get(url, timeout=10)
+        r = http_client.get(url)
         r.raise_for_status()
         data = r.json().get("translation", {})
         return {code.lower(): meta.get("name", "") for code, meta in data.items()}
@@ -127,55 +174,105 @@ def deepl_supported_targets():
         print(f"[WARN] DeepL list languages failed: {e}")
         return set()
 
-def provider_chain_for(dest: str):
+def _eligible_providers(dest: str):
     """
-    Decide which providers to try, in order Azure -> Google -> DeepL,
+    Providers to consider for dest, in order Azure -> Google -> DeepL,
     filtered by (a) env/config present and (b) provider actually supports target.
     """
     chain = []
-    # Azure
-    if AZ_T_ENDPOINT and AZ_T_KEY and AZ_T_REGION:
-        az_code = normalize_for_azure(dest).lower()
-        if az_code in azure_supported_targets():
-            chain.append("azure")
-        else:
-            print(f"[WARN] Azure does not list target='{az_code}'.")
-    # Google
-    try:
-        g_code = normalize_for_google(dest)
-        if g_code in set(GT_LANGUAGES.keys()):
-            chain.append("google")
-        else:
-            print(f"[WARN] googletrans does not list target='{g_code}'.")
-    except Exception as e:
-        print(f"[WARN] googletrans LANGUAGES unavailable: {e}")
-    # DeepL
-    if DEEPL_API_KEY:
-        d_code = normalize_for_deepl(dest)
-        if d_code in deepl_supported_targets():
-            chain.append("deepl")
-        else:
-            print(f"[WARN] DeepL does not list target='{d_code}'.")
+    if AZ_T_ENDPOINT and AZ_T_KEY and AZ_T_REGION and normalize_for_azure(dest).lower() in azure_supported_targets():
+        chain.append("azure")
+    if normalize_for_google(dest) in google_supported_targets():
+        chain.append("google")
+    if DEEPL_API_KEY and normalize_for_deepl(dest) in deepl_supported_targets():
+        chain.append("deepl")
+    return tuple(chain)
+
+@lru_cache(maxsize=1)
+def routing_table():
+    """Target language -> eligible providers for every language we know of. Built once per process."""
+    codes = set(LANGUAGE_FONT_MAP) | google_supported_targets() | set(azure_supported_targets())
+    codes |= {code.lower() for code in deepl_supported_targets()}
+    table = {}
+    for code in codes:
+        dest = normalize_lang_code(code)
+        if dest not in table:
+            table[dest] = _eligible_providers(dest)
+    routable = sum(1 for chain in table.values() if chain)
+    print(f"[INFO] Provider routing: {routable} of {len(table)} target languages have a provider.")
+    return table
+
+def provider_chain_for(dest: str):
+    """
+    Providers to try for dest: the routing table's eligible providers, minus
+    any whose circuit breaker is open, fastest first (PROVIDER_ROUTING=latency)
+    or in the static Azure -> Google -> DeepL order (PROVIDER_ROUTING=static).
+    """
+    table = routing_table()
+    if dest not in table:
+        table[dest] = _eligible_providers(dest)  # a code no provider listed at startup
+    chain = [name for name in table[dest] if provider_health.health_for(name).available()]
+    if PROVIDER_ROUTING == "latency":
+        chain = provider_health.order_by_speed(chain)
     return chain
 
 
 # OCR
+OCR_CONTRAST = 2.5
+OCR_THRESHOLD = 180
+
+def _binarize_lut(mean: int, contrast: float = OCR_CONTRAST, threshold: int = OCR_THRESHOLD):
+    """Contrast stretch around the mean and threshold, folded into one 256-entry table."""
+    lut = []
+    for x in range(256):
+        v = max(0, min(255, int(mean + contrast * (x - mean))))
+        lut.append(0 if v < threshold else 255)
+    return lut
+
 def preprocess_image_for_ocr(image_path):
-    image = Image.open(image_path).convert("RGB")
-    gray_image = ImageOps.grayscale(image)
-    contrast_enhancer = ImageEnhance.Contrast(gray_image)
-    contrast_image = contrast_enhancer.enhance(2.5)
-    threshold = 180
-    binarized_image = contrast_image.point(lambda x: 0 if x < threshold else 255).convert("L")
-    return binarized_image
+    image = open_image(image_path)
+    gray_image = ImageOps.grayscale(image.convert("RGB"))
+    # Same result as ImageEnhance.Contrast(...).enhance(2.5) + threshold, in a single pass
+    hist = gray_image.histogram()
+    total = sum(hist) or 1
+    mean = int(sum(i * n for i, n in enumerate(hist)) / total + 0.5)
+    return gray_image.point(_binarize_lut(mean))
 
-def perform_ocr_with_google_vision(image_path):
-    client = vision.ImageAnnotatorClient()
-    with open(image_path, "rb") as image_file:
-        content = image_file.read()
-    image = vision.Image(content=content)
-    response = client.text_detection(image=image)
-    annotations = response.text_annotations
+VISION_BATCH_SIZE = 16  # images per batch_annotate_images call (API limit)
+
+@lru_cache(maxsize=1)
+def _vision_client(pid: int):
+    return startup.lazy_import("google.cloud.vision").ImageAnnotatorClient()
+
+def vision_client():
+    """One Vision client per process; gRPC channels must not be shared across fork."""
+    return _vision_client(os.getpid())
+
+@lru_cache(maxsize=1)
+def _vision_line_ends():
+    break_type = startup.lazy_import("google.cloud.vision").TextAnnotation.DetectedBreak.BreakType
+    return (break_type.LINE_BREAK, break_type.EOL_SURE_SPACE)
+
+def _boxes_from_annotations(annotations, full_text=None):
+    """
+    Word boxes from a Vision response. When the full-text hierarchy is
+    present, words come from it and carry (block, paragraph, line) layout.
+    """
+    if full_text is not None and full_text.pages:
+        boxes, layout = [], []
+        block_no = 0
+        for page in full_text.pages:
+            for block in page.blocks:
+                for para_no, paragraph in enumerate(block.paragraphs):
+                    line_no = 0
+                    for word in paragraph.words:
+                        text = "".join(symbol.text for symbol in word.symbols)
+                        boxes.append(([(v.x, v.y) for v in word.bounding_box.vertices], text))
+                        layout.append((block_no, para_no, line_no))
+                        if word.symbols and word.symbols[-1].property.detected_break.type_ in _vision_line_ends():
+                            line_no += 1
+                block_no += 1
+        return OcrBoxes(boxes, layout)
 
     extracted_text_boxes = []
     if annotations:
@@ -183,90 +280,99 @@ def perform_ocr_with_google_vision(image_path):
             vertices = [(v.x, v.y) for v in annotation.bounding_poly.vertices]
             text = annotation.description
             extracted_text_boxes.append((vertices, text))
-    return extracted_text_boxes
+    return OcrBoxes(extracted_text_boxes)
+
+def perform_ocr_with_google_vision(image_path):
+    vision = startup.lazy_import("google.cloud.vision")
+    image = vision.Image(content=image_bytes(image_path))
+    response = vision_client().text_detection(image=image)
+    return _boxes_from_annotations(response.text_annotations, response.full_text_annotation)
+
+def perform_ocr_batch_google_vision(sources):
+    """OCR several images with multi-image annotate calls; one box list per source."""
+    vision = startup.lazy_import("google.cloud.vision")
+    feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+    results = []
+    for start in range(0, len(sources), VISION_BATCH_SIZE):
+        chunk = sources[start:start + VISION_BATCH_SIZE]
+        requests = [
+            vision.AnnotateImageRequest(image=vision.Image(content=image_bytes(src)), features=[feature])
+            for src in chunk
+        ]
+        response = vision_client().batch_annotate_images(requests=requests)
+        for src, res in zip(chunk, response.responses):
+            if res.error.message:
+                raise RuntimeError(f"Vision failed for {src if isinstance(src, str) else 'image'}: {res.error.message}")
+            results.append(_boxes_from_annotations(res.text_annotations, res.full_text_annotation))
+    return results
+
+def perform_ocr(image_path, engine: str = None):
+    """Run the configured OCR engine; every engine returns [(vertices, text), ...]."""
+    engine = (engine or OCR_ENGINE).lower()
+    if engine == "tesseract":
+        return startup.lazy_import("ocr_tesseract").perform_ocr_with_tesseract(preprocess_image_for_ocr(image_path))
+    return perform_ocr_with_google_vision(image_path)
 
 
 # Text layout / coordinate-drawing
-def get_font(image, text, width, height, lang_code):
-    font = None
-    box = None
-    x = 0
-    y = 0
-    draw = ImageDraw.Draw(image)
-    for size in range(1, 500):
-        new_font = get_font_by_lang(lang_code, size)
-        new_box = draw.textbbox((0, 0), text, font=new_font)
-        new_w = new_box[2] - new_box[0]
-        new_h = new_box[3] - new_box[1]
-        if new_w > width or new_h > height:
-            break
-        font = new_font
-        box = new_box
-        w = new_w
-        h = new_h
-        x = (width - w) // 2 - box[0]
-        y = (height - h) // 2 - box[1]
-    return font, x, y
-
-def add_discoloration(color, strength):
-    r, g, b = color[:3]
-    r = max(0, min(255, r + strength))
-    g = max(0, min(255, g + strength))
-    b = max(0, min(255, b + strength))
-    if r == 255 and g == 255 and b == 255:
-        r, g, b = 245, 245, 245
-    return (r, g, b)
+def box_bounds(vertices):
+    xs = [x for x, _ in vertices]
+    ys = [y for _, y in vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def fit_text_boxes(translated_texts, text_boxes, lang_code):
+    """
+    Fit every translation into its OCR box. Returns a list aligned to
+    text_boxes with a FitResult per box (None where there is nothing to draw).
+    """
+    fits = []
+    for text_box, translated in zip(text_boxes, translated_texts):
+        if not translated:
+            fits.append(None)
+            continue
+        x_min, y_min, x_max, y_max = box_bounds(text_box[0])
+        fits.append(fit_text(translated, x_max - x_min, y_max - y_min,
+                             lambda size: get_font_by_lang(lang_code, size)))
+    return fits
 
 def get_background_color(image, x_min, y_min, x_max, y_max):
-    image = image.convert('RGBA')
-    margin = 10
-    edge_region = image.crop((
-        max(x_min - margin, 0),
-        max(y_min - margin, 0),
-        min(x_max + margin, image.width),
-        min(y_max + margin, image.height),
-    ))
-    pixels = list(edge_region.getdata())
-    opaque_pixels = [p[:3] for p in pixels if p[3] > 0]
-    if not opaque_pixels:
-        background_color = (255, 255, 255)
-    else:
-        from collections import Counter
-        background_color = Counter(opaque_pixels).most_common(1)[0][0]
-    return add_discoloration(background_color, 40)
+    box = ([(x_min, y_min), (x_max, y_max)], None)
+    colors = background.background_colors(background.image_to_rgba_array(image), [box])
+    return tuple(int(c) for c in colors[0])
 
 def get_text_fill_color(background_color):
     luminance = (0.299 * background_color[0] + 0.587 * background_color[1] + 0.114 * background_color[2]) / 255
     return "black" if luminance > 0.5 else "white"
 
-def replace_text_with_translation(image_path, translated_texts, text_boxes, lang_code):
-    image = Image.open(image_path)
-    draw = ImageDraw.Draw(image)
-    for text_box, translated in zip(text_boxes, translated_texts):
+def draw_translations(plate: CleanPlate, translated_texts, lang_code):
+    """
+    Draw translations onto a copy of a clean plate. Erased boxes without a
+    translation get their original pixels back.
+    """
+    out = plate.image.copy()
+    draw = ImageDraw.Draw(out)
+    fits = fit_text_boxes(translated_texts, plate.boxes, lang_code)
+    for text_box, translated, fit, color, patch in zip(plate.boxes, translated_texts, fits,
+                                                      plate.colors, plate.patches):
+        if color is None:
+            continue
+        x_min, y_min, x_max, y_max = box_bounds(text_box[0])
         if not translated:
+            out.paste(patch, (x_min, y_min))
             continue
-        x_min, y_min = text_box[0][0][0], text_box[0][0][1]
-        x_max, y_max = text_box[0][0][0], text_box[0][0][1]
-        for x, y in text_box[0]:
-            x_min = min(x_min, x)
-            x_max = max(x_max, x)
-            y_min = min(y_min, y)
-            y_max = max(y_max, y)
-
-        background_color = get_background_color(image, x_min, y_min, x_max, y_max)
-        draw.rectangle(((x_min, y_min), (x_max, y_max)), fill=background_color)
-
-        font_name = LANGUAGE_FONT_MAP.get(lang_code, 'NotoSans-Regular.ttf')
+
+        font_name = LANGUAGE_FONT_MAP.get(lang_code, DEFAULT_FONT)
         debug_text(translated, lang_code, font_name)
 
-        font, x_offset, y_offset = get_font(image, translated, x_max - x_min, y_max - y_min, lang_code)
-        draw.text(
-            (x_min + x_offset, y_min + y_offset),
-            translated,
-            fill=get_text_fill_color(background_color),
-            font=font
-        )
-    return image
+        fill = get_text_fill_color(color)
+        for line, x_offset, y_offset in fit.placements:
+            draw.text((x_min + x_offset, y_min + y_offset), line, fill=fill, font=fit.font)
+    return out
+
+def replace_text_with_translation(image_path, translated_texts, text_boxes, lang_code):
+    """Draw translations over a copy of the source (path, bytes or PIL image)."""
+    plate = build_plate(open_image(image_path), text_boxes, translated_texts)
+    return draw_translations(plate, translated_texts, lang_code)
 
 
 # Lang Providers
@@ -277,91 +383,128 @@ def _azure_headers():
         "Content-Type": "application/json"
     }
 
-def azure_translate_batch(texts, src="en", dest="fr", max_chunk=50, sleep_sec=0.05):
+def _azure_translate_chunk(chunk, src, dest_bcp):
+    url = f"{AZ_T_ENDPOINT}/translate?api-version=3.0&from={src}&to={dest_bcp}"
+    body = [{"Text": t} for t in chunk]
+    resp = http_client.post(url, headers=_azure_headers(), data=json.dumps(body))
+    if resp.status_code == 429:
+        raise RateLimited(parse_retry_after(resp.headers.get("Retry-After")))
+    resp.raise_for_status()
+    return [item["translations"][0]["text"] if item.get("translations") else "" for item in resp.json()]
+
+def azure_translate_batch(texts, src="en", dest="fr", max_chunk=50):
     """Assumes caller already verified Azure supports 'dest'."""
     if not (AZ_T_ENDPOINT and AZ_T_KEY and AZ_T_REGION):
         raise RuntimeError("Azure env vars missing: AZURE_TRANSLATOR_KEY / _REGION / _ENDPOINT")
     dest_bcp = normalize_for_azure(dest)
-    url = f"{AZ_T_ENDPOINT}/translate?api-version=3.0&from={src}&to={dest_bcp}"
 
+    chunks = [texts[i:i+max_chunk] for i in range(0, len(texts), max_chunk)]
     out = []
-    i = 0
-    while i < len(texts):
-        chunk = texts[i:i+max_chunk]
-        body = [{"Text": t} for t in chunk]
-        resp = requests.post(url, headers=_azure_headers(), data=json.dumps(body), timeout=25)
-        if resp.status_code == 429:
-            time.sleep(1.0)
-            continue
-        resp.raise_for_status()
-        data = resp.json()
-        for item in data:
-            if item.get("translations"):
-                out.append(item["translations"][0]["text"])
-            else:
-                out.append("")
-        i += max_chunk
-        time.sleep(sleep_sec)
+    translated_chunks = dispatch("azure", lambda chunk: _azure_translate_chunk(chunk, src, dest_bcp), chunks,
+                                 default=None)
+    for chunk, translated in zip(chunks, translated_chunks):
+        out.extend(translated if translated is not None else [""] * len(chunk))
     return out
 
 @lru_cache(maxsize=1)
-def _google_t():
-    # googletrans is stateless; cache the instance
-    return GoogleTranslator(service_urls=[
+def _google_client(pid: int):
+    return startup.lazy_import("googletrans").Translator(service_urls=[
         'translate.googleapis.com',
         'translate.google.com'
     ])
 
+def _google_t():
+    """One googletrans client per process, so forked workers don't share its connection pool."""
+    return _google_client(os.getpid())
+
+def _google_translate_one(text, src, dest):
+    try:
+        return _google_t().translate(text, src=src, dest=dest).text
+    except Exception as e:
+        if "429" in str(e):
+            raise RateLimited()
+        raise
+
 def google_translate_batch(texts, src="en", dest="fr"):
     """Assumes caller already verified googletrans supports 'dest'."""
-    tr = _google_t()
-    out = []
-    for t in texts:
-        try:
-            res = tr.translate(t, src=src, dest=dest)
-            out.append(res.text)
-        except Exception as e:
-            print(f"[WARN] googletrans failed for '{t[:30]}...': {e}")
-            out.append("")
-    return out
+    return dispatch("google", lambda t: _google_translate_one(t, src, dest), texts)
 
 @lru_cache(maxsize=1)
+def _deepl_client(pid: int):
+    return startup.lazy_import("deepl").Translator(DEEPL_API_KEY)
+
 def _deepl_translator():
+    """One DeepL client per process (None without DEEPL_API_KEY), like _google_t()."""
     if not DEEPL_API_KEY:
         return None
-    return deepl.Translator(DEEPL_API_KEY)
+    return _deepl_client(os.getpid())
+
+def _deepl_translate_one(text, src, dest_up):
+    deepl = startup.lazy_import("deepl")
+    try:
+        return _deepl_translator().translate_text(text, source_lang=src.upper(), target_lang=dest_up).text
+    except deepl.TooManyRequestsException:
+        raise RateLimited()
 
 def deepl_translate_batch(texts, src="EN", dest="FR"):
     """Assumes caller already verified DeepL supports 'dest'."""
-    tr = _deepl_translator()
-    if not tr:
+    if not _deepl_translator():
         raise RuntimeError("DEEPL_API_KEY missing")
     dest_up = normalize_for_deepl(dest)
-    out = []
-    for t in texts:
-        try:
-            res = tr.translate_text(t, source_lang=src.upper(), target_lang=dest_up)
-            out.append(res.text)
-        except Exception as e:
-            print(f"[WARN] DeepL failed for '{t[:30]}...': {e}")
-            out.append("")
-    return out
+    return dispatch("deepl", lambda t: _deepl_translate_one(t, src, dest_up), texts)
+
+# Background health probes use free metadata endpoints, never a billed
+# translation. googletrans has none, so Google gets a single half-open trial
+# call from real traffic after its cooldown instead.
+def _probe_azure():
+    r = http_client.get(f"{AZ_T_ENDPOINT}/languages?api-version=3.0&scope=translation")
+    r.raise_for_status()
 
+def _probe_deepl():
+    if _deepl_translator().get_usage().any_limit_reached:
+        raise RuntimeError("DeepL usage limit reached")
+
+provider_health.set_probe("azure", _probe_azure)
+provider_health.set_probe("deepl", _probe_deepl)
+
+
+# Translation memory
+@lru_cache(maxsize=1)
+def _translation_memory(pid: int):
+    if not TM_PATH:
+        return None
+    return TranslationMemory(TM_PATH)
+
+def translation_memory():
+    """Shared translation memory, or None when TRANSLATION_MEMORY_PATH is empty.
+    One connection per process; SQLite connections must not cross a fork."""
+    return _translation_memory(os.getpid())
 
 
 # Fallback cascade
+def _acceptable(src, cand):
+    return bool(cand and cand.strip() and cand.strip() != src.strip())
+
 def translate_with_fallbacks(texts, src_lang, dest_lang):
     """
-    Try Azure → Google → DeepL for languages each provider supports.
+    Serve what we can from the translation memory, then try
+    Azure → Google → DeepL for the rest, for languages each provider supports.
     Returns a list[str] same length as texts. Only re-tries untranslated items.
+    With PROVIDER_HEDGING=1 the first provider's late chunks are hedged to the second.
     """
+    results = [""] * len(texts)
+    tm = translation_memory()
+    if tm:
+        for i, cached in tm.lookup(texts, src_lang, dest_lang).items():
+            results[i] = cached
+    pending_idx = [i for i, t in enumerate(texts) if not results[i] and t and t.strip()]
+    if not pending_idx:
+        return results
+
     chain = provider_chain_for(dest_lang)
     if not chain:
         print(f"[INFO] No providers support target='{dest_lang}'. Skipping translation.")
-        return [""] * len(texts)
-
-    results = [""] * len(texts)
-    pending_idx = list(range(len(texts)))
+        return results
 
     def run(service_name, batch):
         if service_name == 'azure':
@@ -372,96 +515,201 @@ def translate_with_fallbacks(texts, src_lang, dest_lang):
             return deepl_translate_batch(batch, src=src_lang, dest=dest_lang)
         return [""] * len(batch)
 
+    skip = {}  # provider -> text indices it already answered (unacceptably) while hedging
+    if hedging.HEDGE_ENABLED and len(chain) > 1:
+        backup_tried = set()
+        picked = hedging.translate_hedged([texts[i] for i in pending_idx], chain[0], chain[1], run, _acceptable,
+                                          backup_tried=backup_tried)
+        skip[chain[1]] = {pending_idx[j] for j in backup_tried}
+        fresh = {}
+        new_pending = []
+        for i, pick in zip(pending_idx, picked):
+            if pick is None:
+                new_pending.append(i)
+                continue
+            results[i] = pick[0]
+            fresh.setdefault(pick[1], []).append((texts[i], pick[0]))
+        pending_idx = new_pending
+        if tm:
+            for svc, pairs in fresh.items():
+                tm.store(pairs, src_lang, dest_lang, provider=svc)
+        print(f"[INFO] {chain[0].title()} (hedged) translated {len(texts)-len(pending_idx)} / {len(texts)} so far")
+        chain = chain[1:]
+
     for svc in chain:
         if not pending_idx:
             break
-        outs = run(svc, [texts[i] for i in pending_idx])
-        new_pending = []
-        for j, i in enumerate(pending_idx):
+        ask = [i for i in pending_idx if i not in skip.get(svc, ())]
+        if not ask:
+            continue
+        outs = run(svc, [texts[i] for i in ask])
+        fresh = []
+        for j, i in enumerate(ask):
             cand = outs[j] if j < len(outs) else ""
-            if cand and cand.strip() and cand.strip() != texts[i].strip():
+            if _acceptable(texts[i], cand):
                 results[i] = cand
-            else:
-                new_pending.append(i)
-        pending_idx = new_pending
+                fresh.append((texts[i], cand))
+        pending_idx = [i for i in pending_idx if not results[i]]
+        if tm:
+            tm.store(fresh, src_lang, dest_lang, provider=svc)
         print(f"[INFO] {svc.title()} translated {len(texts)-len(pending_idx)} / {len(texts)} so far")
 
     return results
 
 
+# OCR cleanup
+def get_cleaner():
+    """Process-wide text cleaner; importing it loads the spell checker and wordninja."""
+    return startup.lazy_import("text_cleanup").get_cleaner()
+
+
+# OCR cache
+@lru_cache(maxsize=1)
+def ocr_cache():
+    return OcrCache()
+
+def extract_segments(image_path, text_boxes=None, key=None):
+    """
+    OCR, segment and clean an image. Returns [(vertices, text, cleaned), ...]
+    with cleaned None for empty/junk segments. Results are cached by image
+    content, so translating the same image again skips OCR and cleanup.
+    """
+    key = key or image_key(image_path)
+    segments = ocr_cache().get(key)
+    if segments is not None:
+        return segments
+
+    word_boxes = perform_ocr(image_path) if text_boxes is None else text_boxes
+    cleaner = get_cleaner()
+    segments = []
+    # One segment per line/paragraph (SEGMENT_LEVEL) instead of one per word
+    for vertices, text in segment_boxes(word_boxes):
+        cleaned = None if not text or is_junk(text) else cleaner.clean(text)
+        segments.append((vertices, text, cleaned))
+    ocr_cache().put(key, segments)
+    return segments
+
+def image_key(image_path) -> str:
+    """Content key shared by the OCR and plate caches (also the public plate id)."""
+    return content_key(image_path, OCR_ENGINE, SEGMENT_LEVEL)
+
+
+# Clean plates
+@lru_cache(maxsize=1)
+def plate_cache():
+    return PlateCache()
+
+def clean_plate_for(image_path, text_boxes=None):
+    """(key, CleanPlate) for an image, built once and then served from the plate cache."""
+    if not isinstance(image_path, (str, os.PathLike)):
+        image_path = image_bytes(image_path) if hasattr(image_path, "read") else image_path
+    key = image_key(image_path)
+    plate = plate_cache().get(key)
+    if plate is None:
+        segments = extract_segments(image_path, text_boxes, key=key)
+        plate = build_plate(open_image(image_path), [(v, t) for v, t, _ in segments],
+                            [cleaned or "" for _, _, cleaned in segments])
+        plate_cache().put(key, plate)
+    return key, plate
+
+
 # Main pipeline
-def translate_image_pipeline(image_path, output_path, target_lang, font_map):
-    extracted_text_boxes = perform_ocr_with_google_vision(image_path)
-
-    # Choose font by the internal map key
-    norm = normalize_lang_code(target_lang)
-    selected_lang_code = norm if norm in font_map else "en"
-
-    # Collect texts to translate, lightly clean
-    src_texts = []
-    index_map = []  # (idx_in_boxes, original_text)
-    spell = SpellChecker()
-
-    for idx, (_, text) in enumerate(extracted_text_boxes):
-        if not text or is_junk(text):
-            src_texts.append("")           # keep slot for alignment
-            index_map.append((idx, None))  # mark as skipped
-            continue
+def render_plate(plate: CleanPlate, target_langs, font_map, texts_out=None) -> dict:
+    """
+    Translate a plate's text into each language and draw it; {target_lang: PIL image}.
+    If texts_out is a dict it receives the page text: "source" -> OCR'd
+    segments, and per language the aligned translations.
+    """
+    if texts_out is not None:
+        texts_out["source"] = [src for src in plate.texts if src]
+    outputs = {}
+    for target_lang in dict.fromkeys(target_langs):
+        # Choose font by the internal map key
+        dest = normalize_lang_code(target_lang)
+        selected_lang_code = dest if dest in font_map else "en"
+
+        # Translate (en -> target) with provider fallback
+        translations = translate_with_fallbacks(plate.texts, src_lang="en", dest_lang=dest)
+
+        # Aligned to boxes (None for unchanged/empty)
+        translated_texts = [tr if src and tr else None for src, tr in zip(plate.texts, translations)]
+        outputs[target_lang] = draw_translations(plate, translated_texts, selected_lang_code)
+        if texts_out is not None:
+            texts_out[target_lang] = [tr or src for src, tr in zip(plate.texts, translated_texts) if src]
+    return outputs
+
+def translate_image_multi(image_path, target_langs, font_map, text_boxes=None, texts_out=None):
+    """
+    Translate one image into several languages. OCR/cleanup and the erased
+    background (the clean plate) are computed once and shared by every
+    output. Returns {target_lang: PIL image} in the order given.
+    """
+    _, plate = clean_plate_for(image_path, text_boxes)
+    return render_plate(plate, target_langs, font_map, texts_out)
+
+def translate_image_pipeline(image_path, output_path, target_lang, font_map, text_boxes=None):
+    """
+    image_path may be a file path, the uploaded bytes or a PIL image. The
+    translated image is returned, and also saved when output_path is given.
+    Pass text_boxes to reuse OCR results computed elsewhere (batch OCR).
+    """
+    image = translate_image_multi(image_path, [target_lang], font_map, text_boxes)[target_lang]
+    if output_path:
+        image.save(output_path)
+    return image
 
-        words = text.split()
-        corrected_words = [spell.correction(w) or w for w in words]
-        corrected_text = " ".join(corrected_words)
 
-        split_words = []
-        for w in corrected_text.split():
-            split_words.extend(wordninja.split(w) if len(w) > 10 else [w])
-        final_text = " ".join(split_words)
+def _encode_pngs(images: dict) -> dict:
+    outputs = {}
+    for lang, image in images.items():
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        outputs[lang] = buf.getvalue()
+    return outputs
 
-        src_texts.append(final_text)
-        index_map.append((idx, final_text))
+def translate_to_pngs(image_data, target_langs, font_map=LANGUAGE_FONT_MAP, texts_out=None) -> dict:
+    """Translate an encoded image into each language; {lang: PNG bytes}. See render_plate for texts_out."""
+    return _encode_pngs(translate_image_multi(image_data, target_langs, font_map, texts_out=texts_out))
+
+def render_plate_to_pngs(plate_id, target_langs, font_map=LANGUAGE_FONT_MAP, texts_out=None):
+    """Re-render a cached plate (by image_key) as {lang: PNG bytes}; None once it is evicted."""
+    plate = plate_cache().get(plate_id)
+    if plate is None:
+        return None
+    return _encode_pngs(render_plate(plate, target_langs, font_map, texts_out=texts_out))
 
-    # Translate (en -> target) with provider fallback
-    dest = normalize_lang_code(target_lang)
-    translations = translate_with_fallbacks(src_texts, src_lang="en", dest_lang=dest)
+def translate_to_png(image_data, target_lang, font_map=LANGUAGE_FONT_MAP) -> bytes:
+    """Translate an encoded image and return the result as PNG bytes."""
+    return translate_to_pngs(image_data, [target_lang], font_map)[target_lang]
 
-    # Build final list aligned to boxes (None for unchanged/empty)
-    translated_texts = []
-    for (idx, original), tr in zip(index_map, translations):
-        if original is None or not tr:
-            translated_texts.append(None)
-        else:
-            translated_texts.append(tr)
 
-    # Draw
-    image = replace_text_with_translation(image_path, translated_texts, extracted_text_boxes, selected_lang_code)
-    image.save(output_path)
+# Warm-up
+def warm_up():
+    """
+    Load what the configured pipeline needs before taking traffic: fonts,
+    the routing table, the routed providers' libraries, the OCR engine's
+    library and the spell dictionary. Prints the startup-timing report.
+
+    Runs in the parent before workers fork, so it loads code and data
+    only: provider clients and gRPC channels are made per process, on
+    first use, by _google_t(), _deepl_translator() and vision_client().
+    """
+    with startup.timed("fonts"):
+        preload_fonts()
+    with startup.timed("routing table"):
+        routed = {name for chain in routing_table().values() for name in chain}
+    for name, module in (("google", "googletrans"), ("deepl", "deepl")):
+        if name in routed:
+            with startup.timed(f"{name} library"):
+                startup.lazy_import(module)
+    with startup.timed(f"ocr engine ({OCR_ENGINE})"):
+        startup.lazy_import("ocr_tesseract" if OCR_ENGINE == "tesseract" else "google.cloud.vision")
+    with startup.timed("spell dictionary"):
+        get_cleaner()
+    startup.report()
 
 
 # Script entry
 if __name__ == "__main__":
-    input_folder = "input"
-    output_folder = "output"
-    target_lang = sys.argv[1] if len(sys.argv) > 1 else "en"
-
-    if AZ_T_ENDPOINT and AZ_T_KEY and AZ_T_REGION:
-        print("[INFO] Azure Translator configured.")
-    else:
-        print("[INFO] Azure not configured. Will use other providers if available.")
-    if DEEPL_API_KEY:
-        print("[INFO] DeepL configured.")
-    else:
-        print("[INFO] DeepL not configured.")
-
-    files = os.listdir(input_folder)
-    image_files = [file for file in files if file.lower().endswith((".jpg", ".jpeg", ".png"))]
-    os.makedirs(output_folder, exist_ok=True)
-
-    for filename in image_files:
-        print(f'[INFO] Processing {filename}...')
-        image_path = os.path.join(input_folder, filename)
-        output_path = os.path.join(
-            output_folder,
-            f"{os.path.splitext(filename)[0]}-translated{os.path.splitext(filename)[1]}"
-        )
-        translate_image_pipeline(image_path, output_path, target_lang, LANGUAGE_FONT_MAP)
-        print(f'[INFO] Saved as {output_path}...')
+    import batch
+    batch.main()
@@ -0,0 +1,256 @@
+# multipage.py
+"""
+Multi-page document translation (PDF and multipage TIFF).
+
+Pages are rasterized lazily, one at a time, and handed to a process pool
+with at most a few pages in flight, so a 40-page packet never sits in
+memory at once. Translated pages are appended to the output file in page
+order as soon as every earlier page is done, and on_page is called for
+each finished page so callers can show progress (and the page itself)
+before the whole document is finished. translate_document_multi renders
+each page into several languages from a single OCR pass.
+
+The page pool is created once per process and shared by every document
+it translates; its workers come from the same start method as the job
+workers (JOB_START_METHOD), never a fork of the threaded server.
+
+PDF rasterization uses pypdfium2, imported only when a PDF is processed.
+"""
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, TiffImagePlugin
+
+from jobs import JOB_START_METHOD
+
+DOC_PAGE_WORKERS = int(os.getenv("DOC_PAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "200"))
+
+DOCUMENT_MIMETYPES = {"pdf": "application/pdf", "tiff": "image/tiff"}
+DOCUMENT_EXTENSIONS = {".pdf": "pdf", ".tif": "tiff", ".tiff": "tiff"}
+
+
+def detect_document_type(data: bytes):
+    """'pdf' or 'tiff' for multi-page capable formats, None for plain images."""
+    if data[:5] == b"%PDF-":
+        return "pdf"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    return None
+
+
+def _pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise RuntimeError("PDF input needs pypdfium2 (pip install pypdfium2)")
+    return pypdfium2
+
+
+def count_pages(data: bytes, kind: str) -> int:
+    if kind == "pdf":
+        return len(_pdfium().PdfDocument(data))
+    with Image.open(io.BytesIO(data)) as im:
+        return getattr(im, "n_frames", 1)
+
+
+def iter_pages(data: bytes, kind: str, dpi: int = PDF_RENDER_DPI):
+    """Yield each page as an RGB PIL image, decoding only one page at a time."""
+    if kind == "pdf":
+        pdf = _pdfium().PdfDocument(data)
+        try:
+            for i in range(len(pdf)):
+                page = pdf[i]
+                try:
+                    yield page.render(scale=dpi / 72).to_pil().convert("RGB")
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+        return
+    with Image.open(io.BytesIO(data)) as im:
+        for i in range(getattr(im, "n_frames", 1)):
+            im.seek(i)
+            yield im.convert("RGB")
+
+
+class PageWriter:
+    """Append pages, in order, to a PDF or multipage TIFF written to fp."""
+
+    def __init__(self, fp, kind: str, dpi: int = PDF_RENDER_DPI):
+        self.fp = fp
+        self.kind = kind
+        self.dpi = dpi
+        self.pages = 0
+        self._tiff = TiffImagePlugin.AppendingTiffWriter(fp, new=True) if kind == "tiff" else None
+
+    def add(self, image):
+        if self._tiff is not None:
+            image.save(self._tiff, format="TIFF", compression="tiff_deflate")
+            self._tiff.newFrame()
+        else:
+            image.save(self.fp, format="PDF", append=self.pages > 0, resolution=self.dpi)
+        self.pages += 1
+
+    def close(self):
+        if self._tiff is not None:
+            self._tiff.close()
+
+
+_pool = None  # (pid, workers, executor); a forked child must not reuse its parent's pool
+_pool_lock = threading.Lock()
+
+
+def _page_pool(workers: int, broken=None):
+    """This process's page pool; replaced when it is broken (a page worker died)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != os.getpid() or _pool[1] != workers or _pool[2] is broken:
+            if _pool is not None and _pool[0] == os.getpid():
+                _pool[2].shutdown(wait=False, cancel_futures=True)
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context(JOB_START_METHOD))
+            _pool = (os.getpid(), workers, executor)
+            atexit.register(executor.shutdown, wait=False, cancel_futures=True)
+        return _pool[2]
+
+
+class _SharedPool:
+    """
+    One document's view of the process's page pool: starts a new pool if the
+    current one broke, and on exit cancels the pages it never got to.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for future in self.futures:
+            future.cancel()
+        return False
+
+    def submit(self, fn, *args):
+        pool = _page_pool(self.workers)
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            future = _page_pool(self.workers, broken=pool).submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+
+class _InlineExecutor:
+    """Runs tasks in the calling process (workers=1, or inside a pool worker)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def translate_page(image, target_langs):
+    """Pool task: translate one page image into each language; ({lang: PNG bytes}, page text)."""
+    import main
+    texts = {}
+    pngs = main.translate_to_pngs(image, target_langs, texts_out=texts)
+    return pngs, texts
+
+
+def translate_document(data: bytes, target_lang: str, out_fp, workers: int = DOC_PAGE_WORKERS, on_page=None,
+                       page_texts=None):
+    """
+    Translate every page of a PDF/TIFF and write the result to out_fp in the
+    same format (out_fp must be readable too, e.g. BytesIO or "w+b", since
+    PDF appends re-read what was written). on_page(index, total, png_bytes, error) fires as each page
+    finishes (in completion order). A page that fails is written untranslated.
+    Returns the document kind.
+    """
+    def page_done(index, total, pngs, error):
+        if on_page:
+            on_page(index, total, pngs[target_lang] if pngs else None, error)
+
+    return translate_document_multi(data, [target_lang], {target_lang: out_fp}, workers, page_done, page_texts)
+
+
+def translate_document_multi(data: bytes, target_langs, out_fps: dict, workers: int = DOC_PAGE_WORKERS,
+                             on_page=None, page_texts=None):
+    """
+    translate_document for several languages at once: each page is OCR'd
+    once and rendered per language, and written to out_fps[lang].
+    on_page receives {lang: png_bytes} (None on error) instead of one PNG.
+    If page_texts is a dict it receives each page's text by index (see
+    main.render_plate).
+    """
+    kind = detect_document_type(data)
+    if kind is None:
+        raise ValueError("not a PDF or TIFF document")
+    target_langs = list(dict.fromkeys(target_langs))
+    total = count_pages(data, kind)
+    writers = {lang: PageWriter(out_fps[lang], kind) for lang in target_langs}
+    workers = max(1, workers)
+    max_in_flight = workers * 2
+
+    pages = enumerate(iter_pages(data, kind))
+    originals = {}   # index -> source page, kept until written (fallback on error)
+    finished = {}    # index -> {lang: translated PIL image} awaiting earlier pages
+    next_to_write = 0
+
+    executor = _SharedPool(workers) if workers > 1 else _InlineExecutor()
+    with executor as pool:
+        in_flight = {}
+
+        def refill():
+            # Bound both the pages being translated and those finished but
+            # still waiting on a slower earlier page.
+            while len(in_flight) < max_in_flight and len(originals) < 2 * max_in_flight:
+                item = next(pages, None)
+                if item is None:
+                    return
+                index, page = item
+                originals[index] = page
+                in_flight[pool.submit(translate_page, page, target_langs)] = index
+
+        refill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    (pngs, texts), error = future.result(), None
+                    if page_texts is not None:
+                        page_texts[index] = texts
+                    finished[index] = {lang: Image.open(io.BytesIO(pngs[lang])) for lang in target_langs}
+                except Exception as e:
+                    pngs, error = None, str(e)
+                    print(f"[WARN] Page {index + 1}/{total} failed: {e}")
+                    finished[index] = dict.fromkeys(target_langs, originals[index])
+                if on_page:
+                    on_page(index, total, pngs, error)
+            while next_to_write in finished:
+                for lang, image in finished.pop(next_to_write).items():
+                    writers[lang].add(image)
+                originals.pop(next_to_write, None)
+                next_to_write += 1
+            refill()
+
+    for writer in writers.values():
+        writer.close()
+    return kind
@@ -0,0 +1,118 @@
+# ocr_cache.py
+"""
+Cache of OCR + cleanup results keyed by image content.
+
+Translating the same upload into a second language (or re-sending it) is
+by far the most common repeat, and OCR is the slowest step that does not
+depend on the target language. Entries live in a small in-memory LRU; when
+OCR_CACHE_DIR is set, every entry is also written there as a pickle and
+read back on a memory miss, so results outlive LRU eviction and restarts
+and are shared by worker processes.
+
+Keys include the OCR engine and segment level, since both change the
+result for identical pixels.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "64"))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "")
+
+
+def content_key(source, *parts) -> str:
+    """sha256 over the image content (encoded bytes, a file, or decoded pixels) and parts."""
+    h = hashlib.sha256()
+    if isinstance(source, Image.Image):
+        h.update(f"{source.mode}:{source.size}".encode())
+        h.update(source.tobytes())
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        h.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    for part in parts:
+        h.update(b"\0" + str(part).encode())
+    return h.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE, spill_dir: str = OCR_CACHE_DIR):
+        self.max_entries = max(1, max_entries)
+        self.spill_dir = spill_dir or None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.pickle")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self.put(key, value, spill=False)
+        return value
+
+    def put(self, key, value, spill=True):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if spill:
+            self._spill(key, value)
+
+    def _load(self, key):
+        if not self.spill_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARN] Dropping unreadable OCR cache entry {key[:12]}: {e}")
+            return None
+
+    def _spill(self, key, value):
+        if not self.spill_dir:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[WARN] Could not spill OCR cache entry: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "spill_dir": self.spill_dir,
+            }
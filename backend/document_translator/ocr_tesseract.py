@@ -0,0 +1,169 @@
+# ocr_tesseract.py
+"""
+Offline OCR with Tesseract, returning the same [(vertices, text), ...]
+boxes as perform_ocr_with_google_vision.
+
+Large scans are cut into overlapping tiles that are recognized in a
+process pool. Each tile only keeps the words whose centre lies in its own
+core (the tile minus half the overlap on every interior side) and that are
+not clipped by an interior edge, so words on a seam are reported once, by
+the tile that sees them whole. A word wider than the overlap is clipped in
+every tile; of those clipped copies, the largest is kept.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytesseract
+
+from segmentation import OcrBoxes
+
+TESSERACT_CMD = os.getenv("TESSERACT_CMD")
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--psm 11")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+TILE_SIZE = int(os.getenv("OCR_TILE_SIZE", "2000"))
+TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "200"))
+MIN_CONFIDENCE = 0
+
+if TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+_pool = None  # (pid, executor); a forked child must not reuse its parent's pool
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != os.getpid():
+            _pool = (os.getpid(), ProcessPoolExecutor(max_workers=OCR_WORKERS))
+            atexit.register(_pool[1].shutdown, wait=False, cancel_futures=True)
+        return _pool[1]
+
+
+def tile_grid(width: int, height: int, tile: int = TILE_SIZE, overlap: int = TILE_OVERLAP):
+    """
+    Overlapping tiles covering the image as (x0, y0, x1, y1, core), where core
+    is the (x0, y0, x1, y1) region this tile is responsible for.
+    """
+    step = max(tile - overlap, 1)
+
+    def starts(length):
+        if length <= tile:
+            return [0]
+        out = list(range(0, length - tile, step))
+        out.append(length - tile)
+        return out
+
+    xs, ys = starts(width), starts(height)
+    tiles = []
+    for iy, y0 in enumerate(ys):
+        for ix, x0 in enumerate(xs):
+            x1, y1 = min(x0 + tile, width), min(y0 + tile, height)
+            # Split each overlap down the middle between neighbouring tiles
+            cx0 = 0 if ix == 0 else (x0 + min(xs[ix - 1] + tile, width)) // 2
+            cx1 = width if ix == len(xs) - 1 else (xs[ix + 1] + x1) // 2
+            cy0 = 0 if iy == 0 else (y0 + min(ys[iy - 1] + tile, height)) // 2
+            cy1 = height if iy == len(ys) - 1 else (ys[iy + 1] + y1) // 2
+            tiles.append((x0, y0, x1, y1, (cx0, cy0, cx1, cy1)))
+    return tiles
+
+
+def recognize_tile(tile_image, lang: str = TESSERACT_LANG, config: str = TESSERACT_CONFIG):
+    """Words in one tile as (left, top, width, height, text, (block, par, line)), tile-local."""
+    data = pytesseract.image_to_data(
+        tile_image, lang=lang, config=config, output_type=pytesseract.Output.DICT
+    )
+    words = []
+    for i, text in enumerate(data["text"]):
+        text = (text or "").strip()
+        if not text or float(data["conf"][i]) < MIN_CONFIDENCE:
+            continue
+        layout = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        words.append((data["left"][i], data["top"][i], data["width"][i], data["height"][i], text, layout))
+    return words
+
+
+def _keep_in_tile(words, tile, image_size, tile_no=0):
+    """
+    Translate words to page coords and drop the ones owned by a neighbour.
+    Returns (kept, clipped): (box, layout) pairs for the words this tile
+    owns, and (box, layout, area) for words cut by an interior edge, which
+    _merge_clipped settles. Layout keys are prefixed with the tile so
+    blocks from different tiles never merge.
+    """
+    x0, y0, x1, y1, (cx0, cy0, cx1, cy1) = tile
+    width, height = image_size
+    kept, clipped_words = [], []
+    for left, top, w, h, text, (block, par, line) in words:
+        gl, gt, gr, gb = left + x0, top + y0, left + x0 + w, top + y0 + h
+        clipped = (
+            (gl <= x0 and x0 > 0) or (gt <= y0 and y0 > 0)
+            or (gr >= x1 and x1 < width) or (gb >= y1 and y1 < height)
+        )
+        box = ([(gl, gt), (gr, gt), (gr, gb), (gl, gb)], text)
+        layout = ((tile_no, block), par, line)
+        if clipped:
+            clipped_words.append((box, layout, w * h))
+            continue
+        mx, my = (gl + gr) / 2, (gt + gb) / 2
+        if cx0 <= mx < cx1 and cy0 <= my < cy1:
+            kept.append((box, layout))
+    return kept, clipped_words
+
+
+def _bounds(box):
+    (gl, gt), _, (gr, gb), _ = box[0]
+    return gl, gt, gr, gb
+
+
+def _mostly_overlaps(a, b) -> bool:
+    """Whether the intersection of a and b covers over half of the smaller one."""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return False
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return iw * ih * 2 > smaller
+
+
+def _merge_clipped(kept, clipped):
+    """
+    Clipped words that no tile saw whole: a word wider than the overlap is
+    cut in every tile it crosses, so keep its largest copy rather than none.
+    """
+    taken = [_bounds(box) for box, _ in kept]
+    merged = []
+    for box, layout, _ in sorted(clipped, key=lambda c: -c[2]):
+        bounds = _bounds(box)
+        if any(_mostly_overlaps(bounds, other) for other in taken):
+            continue  # kept whole by a neighbour, or a smaller copy of a piece already kept
+        taken.append(bounds)
+        merged.append((box, layout))
+    return merged
+
+
+def perform_ocr_with_tesseract(image, max_workers: int = OCR_WORKERS):
+    """
+    OCR a preprocessed PIL image. Small images are recognized in-process;
+    anything larger than one tile is fanned out over the shared pool.
+    """
+    tiles = tile_grid(image.width, image.height)
+    if len(tiles) == 1 or max_workers <= 1:
+        results = [recognize_tile(image.crop(t[:4])) for t in tiles]
+    else:
+        pool = _get_pool()
+        futures = [pool.submit(recognize_tile, image.crop(t[:4])) for t in tiles]
+        results = [f.result() for f in futures]
+
+    kept, clipped = [], []
+    for tile_no, (tile, words) in enumerate(zip(tiles, results)):
+        tile_kept, tile_clipped = _keep_in_tile(words, tile, image.size, tile_no)
+        kept.extend(tile_kept)
+        clipped.extend(tile_clipped)
+    kept.extend(_merge_clipped(kept, clipped))
+    # Reading order: top-to-bottom, then left-to-right
+    kept.sort(key=lambda k: (k[0][0][0][1], k[0][0][0][0]))
+    return OcrBoxes([box for box, _ in kept], [layout for _, layout in kept])
@@ -0,0 +1,154 @@
+# provider_dispatch.py
+"""
+Concurrent, rate-limited dispatch of translation requests.
+
+Each provider gets a token bucket shared by every request in the process.
+Work items run on a thread pool, each one waiting for a token first. When
+a provider answers 429 the bucket is paused for the Retry-After period (or
+an exponential backoff) and its rate is halved; successes creep the rate
+back up to the configured ceiling (AIMD). Results come back in input order.
+
+Every call is also reported to provider_health; once a provider's circuit
+breaker opens, its remaining items are skipped instead of each waiting to
+fail.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from provider_health import health_for
+
+PROVIDER_WORKERS = int(os.getenv("PROVIDER_WORKERS", "8"))
+MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "4"))
+BASE_BACKOFF_SEC = 0.5
+MAX_BACKOFF_SEC = 30.0
+
+# Requests per second per provider (burst = one second's worth)
+PROVIDER_RPS = {
+    "azure": float(os.getenv("AZURE_RPS", "10")),
+    "google": float(os.getenv("GOOGLE_RPS", "5")),
+    "deepl": float(os.getenv("DEEPL_RPS", "5")),
+}
+
+
+class RateLimited(Exception):
+    """Raised by a provider call that was throttled; retry_after is in seconds if known."""
+    def __init__(self, retry_after=None):
+        super().__init__(f"rate limited (retry after {retry_after})")
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds form only), else None."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        self.max_rate = max(rate, 0.01)
+        self.rate = self.max_rate
+        self.capacity = burst or max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, pause: float):
+        """Provider pushed back: stop issuing for `pause` seconds and halve the rate."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.rate = max(self.rate / 2, 0.1)
+            self.tokens = 0
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(provider: str) -> TokenBucket:
+    with _buckets_lock:
+        if provider not in _buckets:
+            _buckets[provider] = TokenBucket(PROVIDER_RPS.get(provider, 5.0))
+        return _buckets[provider]
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def _call_with_retries(provider, fn, item, max_retries):
+    bucket = bucket_for(provider)
+    health = health_for(provider)
+    weight = len(item) if isinstance(item, (list, tuple)) else 1
+    for attempt in range(max_retries + 1):
+        if not health.allow():
+            raise CircuitOpen()
+        bucket.acquire()
+        start = time.monotonic()
+        try:
+            result = fn(item)
+        except RateLimited as e:
+            backoff = min(MAX_BACKOFF_SEC, BASE_BACKOFF_SEC * (2 ** attempt))
+            pause = e.retry_after if e.retry_after is not None else backoff * random.uniform(0.5, 1.5)
+            print(f"[WARN] {provider} throttled; pausing {pause:.2f}s (attempt {attempt + 1})")
+            bucket.throttled(pause)
+            continue
+        except Exception:
+            health.record(False, time.monotonic() - start, weight)
+            raise
+        health.record(True, time.monotonic() - start, weight)
+        bucket.succeeded()
+        return result
+    raise RateLimited()
+
+
+def dispatch(provider: str, fn, items, default="", max_workers: int = PROVIDER_WORKERS, max_retries: int = MAX_RETRIES):
+    """
+    Run fn(item) for every item under the provider's rate limit and return
+    the results in input order. A call that still fails after retries, or
+    raises anything else, yields `default` for that item.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def one(item):
+        try:
+            return _call_with_retries(provider, fn, item, max_retries)
+        except CircuitOpen:
+            return default
+        except Exception as e:
+            label = item[:30] if isinstance(item, str) else type(item).__name__
+            print(f"[WARN] {provider} failed for '{label}...': {e}")
+            return default
+
+    if len(items) == 1 or max_workers <= 1:
+        return [one(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(one, items))
@@ -0,0 +1,198 @@
+# provider_health.py
+"""
+Per-provider health: latency/error statistics and a circuit breaker.
+
+Every provider call made through provider_dispatch is recorded here. After
+BREAKER_FAILURES consecutive bad calls (errors, or calls slower than
+BREAKER_SLOW_SEC) the provider's breaker opens and it is skipped, so a
+provider that is down costs one short burst of failures instead of a
+timeout per text. While open, a background thread probes the provider
+every BREAKER_PROBE_SEC with a free request such as its languages or
+usage endpoint (see set_probe); the first probe that succeeds closes the
+breaker again. The thread only starts in a process whose breaker opened.
+Providers without a probe are let through for a single trial call once
+the cooldown expires.
+
+Throttling (429) is not counted here; provider_dispatch already backs off.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_SLOW_SEC = float(os.getenv("BREAKER_SLOW_SEC", "15"))
+BREAKER_COOLDOWN_SEC = float(os.getenv("BREAKER_COOLDOWN_SEC", "30"))
+BREAKER_PROBE_SEC = float(os.getenv("BREAKER_PROBE_SEC", "10"))
+MAX_COOLDOWN_SEC = 600.0
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 5
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.consecutive_bad = 0
+        self.opened_at = None
+        self.cooldown = BREAKER_COOLDOWN_SEC
+        self.latency_ewma = None       # seconds per text, successful calls only
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # seconds per call, successful calls only
+        self.probe = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be made now. Moves an expired open breaker to half-open."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.probe is None and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                return True  # the single trial call
+            return False
+
+    def available(self) -> bool:
+        """Like allow(), without taking the trial slot; for building provider chains."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            return self.state == OPEN and self.probe is None and time.monotonic() - self.opened_at >= self.cooldown
+
+    def record(self, ok: bool, latency: float, weight: int = 1):
+        """One finished call; weight is the number of texts it carried."""
+        with self._lock:
+            self.calls += 1
+            slow = ok and latency > BREAKER_SLOW_SEC
+            if ok:
+                self.latencies.append(latency)
+                per_text = latency / max(1, weight)
+                self.latency_ewma = per_text if self.latency_ewma is None else (
+                    EWMA_ALPHA * per_text + (1 - EWMA_ALPHA) * self.latency_ewma)
+            else:
+                self.failures += 1
+            if slow:
+                self.slow_calls += 1
+            if ok and not slow:
+                self.consecutive_bad = 0
+                if self.state == HALF_OPEN:
+                    self._close()
+                return
+            self.consecutive_bad += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_bad >= BREAKER_FAILURES):
+                self._open()
+
+    def _open(self):
+        if self.state == HALF_OPEN:
+            self.cooldown = min(MAX_COOLDOWN_SEC, self.cooldown * 2)
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        print(f"[WARN] {self.name} circuit open after {self.consecutive_bad} bad call(s); "
+              f"retrying in {self.cooldown:.0f}s")
+        if self.probe is not None:
+            _ensure_prober()
+
+    def _close(self):
+        self.state = CLOSED
+        self.consecutive_bad = 0
+        self.cooldown = BREAKER_COOLDOWN_SEC
+        print(f"[INFO] {self.name} circuit closed.")
+
+    def run_probe(self):
+        """Background prober: try the provider once if the cooldown has passed."""
+        with self._lock:
+            if self.state != OPEN or time.monotonic() - self.opened_at < self.cooldown:
+                return
+            self.state = HALF_OPEN
+        start = time.monotonic()
+        try:
+            self.probe()
+            ok = True
+        except Exception as e:
+            print(f"[WARN] {self.name} probe failed: {e}")
+            ok = False
+        self.record(ok, time.monotonic() - start)
+
+    def p95(self):
+        """95th percentile call latency over the recent window, or None without data."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        with self._lock:
+            return {
+                "state": self.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "consecutive_bad": self.consecutive_bad,
+                "latency_per_text": self.latency_ewma,
+                "p95": p95,
+            }
+
+
+_health = {}
+_health_lock = threading.Lock()
+_prober = None  # (pid, thread)
+
+
+def health_for(provider: str) -> ProviderHealth:
+    with _health_lock:
+        if provider not in _health:
+            _health[provider] = ProviderHealth(provider)
+        return _health[provider]
+
+
+def set_probe(provider: str, probe):
+    """Register a zero-argument callable that checks the provider without billed usage."""
+    health_for(provider).probe = probe
+
+
+def _probe_loop():
+    while True:
+        time.sleep(BREAKER_PROBE_SEC)
+        with _health_lock:
+            providers = list(_health.values())
+        for health in providers:
+            if health.probe is not None:
+                health.run_probe()
+
+
+def _ensure_prober():
+    global _prober
+    with _health_lock:
+        # Threads don't survive fork, so a worker starts its own
+        if _prober is None or _prober[0] != os.getpid():
+            thread = threading.Thread(target=_probe_loop, name="provider-prober", daemon=True)
+            thread.start()
+            _prober = (os.getpid(), thread)
+
+
+def order_by_speed(providers):
+    """
+    Providers sorted by observed seconds per text. Providers with fewer than
+    MIN_SAMPLES successful calls go after the measured ones, in the order
+    given, so a barely-used fallback doesn't jump the queue on one lucky call.
+    """
+    def key(item):
+        index, name = item
+        health = health_for(name)
+        if len(health.latencies) < MIN_SAMPLES:
+            return (1, index, 0.0)
+        return (0, health.latency_ewma, index)
+    return [name for _, name in sorted(enumerate(providers), key=key)]
+
+
+def stats() -> dict:
+    with _health_lock:
+        providers = dict(_health)
+    return {name: health.stats() for name, health in providers.items()}
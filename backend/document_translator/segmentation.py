@@ -0,0 +1,142 @@
+# segmentation.py
+"""
+Group word-level OCR boxes into lines or paragraphs before translation.
+
+Translating per line/paragraph instead of per word cuts provider calls by
+an order of magnitude and gives the providers real context. When the OCR
+engine reports its own block/paragraph/line hierarchy (OcrBoxes.layout),
+that is used as-is; otherwise words are clustered geometrically: words that
+share a baseline band and sit close together form a line, and lines that
+are stacked tightly with overlapping extents form a paragraph.
+
+Segments keep the [(vertices, text), ...] box shape, with vertices being
+the axis-aligned rectangle around all member words.
+"""
+import os
+
+SEGMENT_LEVEL = os.getenv("SEGMENT_LEVEL", "line").lower()  # "word", "line" or "paragraph"
+LEVELS = ("word", "line", "paragraph")
+
+LINE_OVERLAP = 0.5    # min vertical overlap (fraction of the shorter word) to share a line
+WORD_GAP = 1.5        # max horizontal gap between words, in line heights
+PARA_GAP = 0.8        # max vertical gap between lines of a paragraph, in line heights
+HEIGHT_RATIO = 1.6    # lines whose heights differ more than this are not merged
+
+
+class OcrBoxes(list):
+    """
+    A plain list of (vertices, text) word boxes, plus optional layout: one
+    (block, paragraph, line) key per box as reported by the OCR engine.
+    """
+
+    def __init__(self, boxes=(), layout=None):
+        super().__init__(boxes)
+        self.layout = layout
+
+
+def _rect(vertices):
+    xs = [x for x, _ in vertices]
+    ys = [y for _, y in vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _merge(rects):
+    return (min(r[0] for r in rects), min(r[1] for r in rects),
+            max(r[2] for r in rects), max(r[3] for r in rects))
+
+
+def _to_box(rect, text):
+    x0, y0, x1, y1 = rect
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)], text
+
+
+def _cluster_lines(rects):
+    """Geometric line grouping; returns [members, rect] lists in reading order."""
+    # Left to right, so each word only ever extends a line at its right end
+    order = sorted(range(len(rects)), key=lambda i: (rects[i][0], rects[i][1]))
+    lines = []  # [member indices, merged rect, right edge of last word]
+    for i in order:
+        x0, y0, x1, y1 = rects[i]
+        h = max(y1 - y0, 1)
+        best, best_overlap = None, 0
+        for line in lines:
+            lx0, ly0, lx1, ly1 = line[1]
+            lh = max(ly1 - ly0, 1)
+            overlap = min(y1, ly1) - max(y0, ly0)
+            if overlap < LINE_OVERLAP * min(h, lh) or overlap <= best_overlap:
+                continue
+            if max(h, lh) > HEIGHT_RATIO * min(h, lh):
+                continue
+            if -h <= x0 - line[2] <= WORD_GAP * max(h, lh):
+                best, best_overlap = line, overlap
+        if best is None:
+            lines.append([[i], rects[i], x1])
+        else:
+            best[0].append(i)
+            best[1] = _merge([best[1], rects[i]])
+            best[2] = max(best[2], x1)
+    lines.sort(key=lambda line: (line[1][1], line[1][0]))
+    return [(line[0], line[1]) for line in lines]
+
+
+def _cluster_paragraphs(lines):
+    """Stack consecutive lines into paragraphs; input/output are [members, rect] lists."""
+    paragraphs = []
+    for members, rect in lines:
+        x0, y0, x1, y1 = rect
+        h = max(y1 - y0, 1)
+        target = None
+        for para in reversed(paragraphs[-8:]):
+            px0, py0, px1, py1 = para[1]
+            last_h = para[2]
+            gap = y0 - py1
+            if gap < -h / 2 or gap > PARA_GAP * max(h, last_h):
+                continue
+            if max(h, last_h) > HEIGHT_RATIO * min(h, last_h):
+                continue
+            if min(x1, px1) - max(x0, px0) <= 0:
+                continue  # no horizontal overlap: different column
+            target = para
+            break
+        if target is None:
+            paragraphs.append([list(members), rect, h])
+        else:
+            target[0].extend(members)
+            target[1] = _merge([target[1], rect])
+            target[2] = h
+    return [(p[0], p[1]) for p in paragraphs]
+
+
+def _groups_from_layout(layout, level):
+    """Word indices grouped by the engine's own hierarchy, in first-seen order."""
+    groups = {}
+    for i, key in enumerate(layout):
+        k = tuple(key[:3]) if level == "line" else tuple(key[:2])
+        groups.setdefault(k, []).append(i)
+    return list(groups.values())
+
+
+def segment_boxes(text_boxes, level: str = SEGMENT_LEVEL):
+    """
+    Merge word boxes into line or paragraph segments. Returns a new list of
+    (vertices, text) boxes; level="word" returns the input unchanged.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"unknown segment level {level!r}; expected one of {LEVELS}")
+    if level == "word" or not text_boxes:
+        return list(text_boxes)
+
+    rects = [_rect(vertices) for vertices, _ in text_boxes]
+    layout = getattr(text_boxes, "layout", None)
+    if layout and len(layout) == len(text_boxes):
+        groups = [(g, _merge([rects[i] for i in g])) for g in _groups_from_layout(layout, level)]
+    else:
+        groups = _cluster_lines(rects)
+        if level == "paragraph":
+            groups = _cluster_paragraphs(groups)
+
+    segments = []
+    for members, rect in groups:
+        text = " ".join(text_boxes[i][1] for i in members if text_boxes[i][1])
+        segments.append(_to_box(rect, text))
+    return segments
@@ -0,0 +1,122 @@
+# serve.py
+"""
+Production entry point for the translator: python serve.py (or python
+main.py from the repo root). `python server.py` remains the debug server.
+
+A gunicorn master imports server.py once, which runs main.warm_up(), so
+fonts, the spell dictionary, the routing table and the provider/OCR
+libraries are loaded before it forks SERVE_WORKERS workers. The workers
+share those pages copy-on-write instead of each loading its own copy.
+Clients and connection pools are still built per process after the fork.
+
+Each worker handles SERVE_THREADS requests at a time. After
+SERVE_MAX_REQUESTS requests (plus a random 0..SERVE_MAX_REQUESTS_JITTER,
+so workers don't all recycle at once; gunicorn's max_requests) a worker
+finishes its in-flight requests and exits, and the master forks a fresh
+one from the warm parent. 0 disables recycling. A worker holding async
+jobs (queued, running, or with a result not yet expired) waits until they
+are gone before it recycles.
+
+kill -HUP <master pid> reloads gracefully: new workers start and old ones
+get up to SERVE_GRACEFUL_TIMEOUT seconds to finish. Workers are forked from
+the preloaded master, so code changes need a restart.
+
+Async jobs (/jobs) and clean plates (/plates) are kept in the worker that
+created them. A plate re-render on another worker falls back to a full
+upload, but a job's status polls could land on any worker, so /jobs is
+off here unless JOB_API=1 is set, which also makes SERVE_WORKERS default
+to 1 (scale with SERVE_THREADS). The frontend only uses /upload-image.
+
+gunicorn does not run on Windows; there, serve falls back to Flask's
+threaded server in a single process.
+"""
+import argparse
+import os
+
+# Read by jobs.py on import: polls for a job must reach the worker that owns
+# it, which a prefork server can't promise, so /jobs is opt-in here.
+os.environ.setdefault("JOB_API", "0")
+
+from jobs import JOB_API  # noqa: E402
+
+SERVE_BIND = os.getenv("SERVE_BIND", "0.0.0.0:8000")
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "1" if JOB_API else str(os.cpu_count() or 1)))
+SERVE_THREADS = int(os.getenv("SERVE_THREADS", "4"))
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "1000"))
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "100"))
+SERVE_TIMEOUT = int(os.getenv("SERVE_TIMEOUT", "300"))
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "60"))
+
+
+def _jobs_idle() -> bool:
+    """True unless this worker's job queue holds jobs that recycling would lose."""
+    import server  # preloaded by the master
+    return not server.job_queue.cache_info().currsize or server.job_queue().idle()
+
+
+def _pre_request(worker, req):
+    worker.log.debug("%s %s", req.method, req.path)
+    # gunicorn recycles the worker once this request reaches max_requests; push
+    # the limit back while it still holds async jobs
+    if worker.nr + 1 >= worker.max_requests and not _jobs_idle():
+        worker.max_requests = worker.nr + 2
+
+
+def _gunicorn_app(options: dict):
+    from gunicorn.app.base import BaseApplication
+
+    class TranslatorApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import server  # runs warm_up(); with preload_app this happens once, in the master
+            return server.app
+
+    return TranslatorApplication()
+
+
+def serve(bind: str = SERVE_BIND, workers: int = SERVE_WORKERS, threads: int = SERVE_THREADS,
+          max_requests: int = SERVE_MAX_REQUESTS, max_requests_jitter: int = SERVE_MAX_REQUESTS_JITTER):
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("[WARN] gunicorn is not installed (or this is Windows); serving from one process.")
+        import server
+        host, _, port = bind.rpartition(":")
+        server.app.run(host=host or "0.0.0.0", port=int(port), threaded=True, debug=False)
+        return
+
+    if JOB_API and workers > 1:
+        print(f"[WARN] /jobs is on with {workers} workers: a job is only known to the worker that "
+              "accepted it, so status polls reaching another worker get 404. Unset JOB_API or set SERVE_WORKERS=1.")
+    recycling = f"recycled after ~{max_requests} request(s)" if max_requests > 0 else "never recycled"
+    print(f"[INFO] Serving on {bind} with {workers} worker(s) x {threads} thread(s), {recycling}.")
+    _gunicorn_app({
+        "bind": bind,
+        "workers": max(1, workers),
+        "threads": max(1, threads),
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": SERVE_TIMEOUT,
+        "graceful_timeout": SERVE_GRACEFUL_TIMEOUT,
+        "max_requests": max(0, max_requests),
+        "max_requests_jitter": max(0, max_requests_jitter),
+        "pre_request": _pre_request,
+    }).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the translator with prefork workers.")
+    parser.add_argument("--bind", default=SERVE_BIND, help="host:port (SERVE_BIND)")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="worker processes (SERVE_WORKERS)")
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS, help="threads per worker (SERVE_THREADS)")
+    parser.add_argument("--max-requests", type=int, default=SERVE_MAX_REQUESTS,
+                        help="requests before a worker is recycled, 0 = never (SERVE_MAX_REQUESTS)")
+    args = parser.parse_args()
+    serve(args.bind, args.workers, args.threads, args.max_requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 # server.py
+import io
 import os
 import sys
-from flask import Flask, request, send_file, Blueprint, render_template, abort, flash, redirect
+import json
+import uuid
+import zipfile
+from functools import lru_cache
+from flask import Flask, request, send_file, Blueprint, render_template, abort, flash, redirect, jsonify, url_for
 from flask_cors import CORS
 from jinja2 import TemplateNotFound
 
@@ -11,21 +16,38 @@ DOC_TRANS_DIR = os.path.join(BASE_DIR, 'document_translator')
 INPUT_DIR = os.path.join(DOC_TRANS_DIR, 'input')
 OUTPUT_DIR = os.path.join(DOC_TRANS_DIR, 'output')
 
+# Uploads are processed in memory; set PERSIST_ARTIFACTS=1 (or send persist=1)
+# to also keep the input/output files, e.g. for the chatbot to read.
+PERSIST_ARTIFACTS = os.getenv("PERSIST_ARTIFACTS", "0").lower() in ("1", "true", "yes")
+
 # Ensure paths are importable
 sys.path.append(DOC_TRANS_DIR)
 
 # Import translator logic and font map
+import startup
 from font_map import LANGUAGE_FONT_MAP
-import main as translator_main
+with startup.timed("import main"):
+    import main as translator_main
+import jobs
+import multipage
+import provider_health
+import hedging
 
 # Flask app setup
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Artifact-Name", "X-Artifact-Names", "X-Plate-Id"])
 
 # Create input/output dirs
 os.makedirs(INPUT_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Fonts (FONT_PRELOAD_LANGS), provider routing and the configured provider/OCR
+# libraries are loaded now rather than on the first request. Job workers
+# started with forkserver/spawn re-import this script as __mp_main__; they
+# warm up from JOB_PRELOAD instead.
+if __name__ != '__mp_main__':
+    translator_main.warm_up()
+
 # Blueprint
 alibi_entry = Blueprint('Alibi Entry Point', __name__, template_folder='templates')
 
@@ -52,21 +74,197 @@ def upload_image():
         flash("No selected image.")
         return redirect(request.url)
 
-    input_path = os.path.join(INPUT_DIR, 'temp.jpg')
-    file.save(input_path)
+    image_data = file.read()
+    target_langs = _target_languages(request.form)
+    persist = PERSIST_ARTIFACTS or request.form.get('persist', '').lower() in ('1', 'true', 'yes')
+
+    # PDFs / multipage TIFFs come back in the same format, pages translated in parallel.
+    # Several target languages share one OCR pass (and erased background) per image/page.
+    kind = multipage.detect_document_type(image_data)
+    if kind:
+        bufs = {lang: io.BytesIO() for lang in target_langs}
+        page_texts = {}
+        multipage.translate_document_multi(image_data, target_langs, bufs, page_texts=page_texts)
+        outputs, mimetype = {lang: buf.getvalue() for lang, buf in bufs.items()}, multipage.DOCUMENT_MIMETYPES[kind]
+        text_pages = [page_texts[i] for i in sorted(page_texts)]
+    else:
+        # Call pipeline (it handles normalization + provider fallbacks internally)
+        texts = {}
+        outputs = translator_main.translate_to_pngs(image_data, target_langs, LANGUAGE_FONT_MAP, texts_out=texts)
+        mimetype, text_pages = "image/png", [texts]
+
+    output_ext = _output_ext(kind)
+    if len(outputs) == 1:
+        response = send_file(io.BytesIO(next(iter(outputs.values()))), mimetype=mimetype)
+    else:
+        stem = os.path.splitext(os.path.basename(file.filename))[0] or 'image'
+        response = send_file(_zip_outputs(outputs, stem, output_ext), mimetype='application/zip',
+                             as_attachment=True, download_name=f"{stem}-translated.zip")
+
+    if not kind:
+        # Lets the client switch language via /plates/<id> without re-uploading
+        response.headers['X-Plate-Id'] = translator_main.image_key(image_data)
+    if persist:
+        artifacts = save_artifacts(image_data, file.filename, outputs, output_ext, text_pages)
+        # One file name per header value: the first language's, plus all of them as JSON
+        response.headers['X-Artifact-Name'] = artifacts[target_langs[0]]
+        if len(artifacts) > 1:
+            response.headers['X-Artifact-Names'] = json.dumps(artifacts)
+    return response
+
+# Re-render an already uploaded image into another language from its cached
+# clean plate (text erased, boxes and colours known): only the text is drawn.
+# persist=1 saves the output (not the source again) like an upload does.
+@app.route('/plates/<plate_id>', methods=['GET'])
+def render_plate(plate_id):
+    lang = request.args.get('targetLanguage', 'en')
+    persist = PERSIST_ARTIFACTS or request.args.get('persist', '').lower() in ('1', 'true', 'yes')
+    texts = {}
+    outputs = translator_main.render_plate_to_pngs(plate_id, [lang], LANGUAGE_FONT_MAP, texts_out=texts)
+    if outputs is None:
+        return jsonify({"error": "Plate expired; upload the image again."}), 404
+    response = send_file(io.BytesIO(outputs[lang]), mimetype="image/png")
+    if persist:
+        response.headers['X-Artifact-Name'] = save_artifacts(None, None, outputs, text_pages=[texts])[lang]
+    return response
+
+def _target_languages(form):
+    """targetLanguages (repeated and/or comma-separated) if sent, else the single targetLanguage."""
+    langs = [code.strip() for value in form.getlist('targetLanguages') for code in value.split(',') if code.strip()]
+    return list(dict.fromkeys(langs)) or [form.get('targetLanguage', 'en')]
+
+def _zip_outputs(outputs, stem, output_ext):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:  # PNG/PDF/TIFF are compressed already
+        for lang, data in outputs.items():
+            zf.writestr(f"{stem}-translated-{lang}{output_ext}", data)
+    buf.seek(0)
+    return buf
+
+def _output_ext(kind):
+    return {"pdf": ".pdf", "tiff": ".tiff"}.get(kind, ".png")
+
+def save_artifacts(image_data, filename, output_data, output_ext=".png", text_pages=None):
+    """
+    Write the upload and its translation under a per-request name; returns
+    {lang: output file name}. output_data may be a {lang: bytes} dict, in which
+    case one file per language is written (bare bytes are keyed None). The
+    upload is skipped when image_data is None.
+    text_pages (per page: OCR'd source segments and their translations) is
+    written next to each output as <name>.text.json for the chatbot's index.
+    """
+    stem = uuid.uuid4().hex
+    ext = os.path.splitext(filename or '')[1].lower() or '.jpg'
+    if image_data is not None:
+        with open(os.path.join(INPUT_DIR, f"{stem}{ext}"), 'wb') as f:
+            f.write(image_data)
+    if not isinstance(output_data, dict):
+        output_data = {None: output_data}
+    names = {}
+    for lang, data in output_data.items():
+        if len(output_data) > 1:
+            output_name = f"{stem}-translated-{lang}{output_ext}"
+        else:
+            output_name = f"{stem}-translated{output_ext}"
+        with open(os.path.join(OUTPUT_DIR, output_name), 'wb') as f:
+            f.write(data)
+        if text_pages is not None:
+            with open(os.path.join(OUTPUT_DIR, f"{output_name}.text.json"), 'w', encoding='utf-8') as f:
+                json.dump({"document": output_name, "pages": text_pages}, f, ensure_ascii=False)
+        names[lang] = output_name
+    return names
+
+# Job API: submit returns immediately; poll status, then fetch the result
+def _persist_job(job):
+    if job.context.get('persist'):
+        artifacts = save_artifacts(job.context['image'], job.context['filename'], job.result,
+                                   _output_ext(job.context.get('kind')), job.context.get('pages'))
+        job.meta['artifact'] = next(iter(artifacts.values()))
+
+@lru_cache(maxsize=1)
+def job_queue():
+    """Started on first use, so the reloader parent and prefork masters don't own workers."""
+    return jobs.JobQueue(on_done=_persist_job)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    if not jobs.JOB_API:
+        return jsonify({"error": "Async jobs are disabled on this server (JOB_API=0); use /upload-image."}), 404
+    file = request.files.get('image')
+    if file is None or file.filename == '':
+        return jsonify({"error": "No image uploaded."}), 400
+
+    image_data = file.read()
+    persist = PERSIST_ARTIFACTS or request.form.get('persist', '').lower() in ('1', 'true', 'yes')
+    payload = {"image": image_data, "target_lang": request.form.get('targetLanguage', 'en')}
+    kind = multipage.detect_document_type(image_data)
+    context = {"persist": True, "image": image_data, "filename": file.filename, "kind": kind} if persist else None
+    meta = {"mimetype": multipage.DOCUMENT_MIMETYPES.get(kind, "image/png")}
+    try:
+        job = job_queue().submit(payload, context=context, meta=meta)
+    except jobs.QueueFull as e:
+        response = jsonify({"error": f"Translation queue is full: {e}"})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('job_status', job_id=job.id),
+        "result_url": url_for('job_result', job_id=job.id),
+    }), 202
+
+def _job_or_404(job_id):
+    if not jobs.JOB_API:
+        abort(404)
+    job = job_queue().get(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    return jsonify(_job_or_404(job_id).to_dict())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = _job_or_404(job_id)
+    if job.status != jobs.DONE:
+        return jsonify({"job_id": job.id, "status": job.status, "error": job.error}), 409
+    response = send_file(io.BytesIO(job.result), mimetype=job.meta.get('mimetype', 'image/png'))
+    if job.meta.get('artifact'):
+        response.headers['X-Artifact-Name'] = job.meta['artifact']
+    return response
 
-    requested_lang = request.form.get('targetLanguage', 'en')
-    output_path = os.path.join(OUTPUT_DIR, 'translated.png')
+# Pages of a multi-page job are available as soon as each one is translated (1-based)
+@app.route('/jobs/<job_id>/pages/<int:page>', methods=['GET'])
+def job_page(job_id, page):
+    job = _job_or_404(job_id)
+    png = job.pages.get(page - 1)
+    if png is None:
+        return jsonify({"job_id": job.id, "status": job.status, "page": page, "ready": False}), 409
+    return send_file(io.BytesIO(png), mimetype="image/png")
 
-    # Call pipeline (it handles normalization + provider fallbacks internally)
-    translator_main.translate_image_pipeline(
-        image_path=input_path,
-        output_path=output_path,
-        target_lang=requested_lang,
-        font_map=LANGUAGE_FONT_MAP
-    )
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    _job_or_404(job_id)
+    return jsonify({"job_id": job_id, "cancelled": job_queue().cancel(job_id)})
 
-    return send_file(output_path, mimetype="image/png")
+# Cache counters, for sizing the caches to our language mix
+@app.route('/stats', methods=['GET'])
+def stats():
+    tm = translator_main.translation_memory()
+    return jsonify({
+        "fonts": translator_main.FONT_REGISTRY.stats(),
+        "cleanup": translator_main.get_cleaner().stats(),
+        "translation_memory": tm.stats() if tm else None,
+        "ocr_cache": translator_main.ocr_cache().stats(),
+        "plates": translator_main.plate_cache().stats(),
+        "providers": provider_health.stats(),
+        "hedging": hedging.stats(),
+        "jobs": job_queue().stats() if job_queue.cache_info().currsize else None,
+        "startup": startup.stats(),
+    })
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1,67 @@
+# startup.py
+"""
+Lazy imports and startup timing.
+
+The provider and OCR client libraries (Vision, googletrans, DeepL,
+Tesseract, the spell checker) are slow to import. main.py loads them
+through lazy_import() the first time they are needed, so a process only
+pays for the providers and OCR engine its configuration uses. The server
+preloads that set with main.warm_up() before it takes traffic.
+
+Imports and warm-up steps are timed. report() prints where startup time
+went, and /stats serves the same numbers.
+"""
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_started = time.perf_counter()
+_ready_after = None  # seconds from import of this module to report()
+_steps = []  # [(label, seconds)] in completion order
+_lock = threading.Lock()
+
+
+def record(label: str, seconds: float):
+    with _lock:
+        _steps.append((label, seconds))
+
+
+@contextmanager
+def timed(label: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(label, time.perf_counter() - start)
+
+
+def lazy_import(name: str):
+    """Import a module on first use, timing the import."""
+    # Always go through import_module: it waits on the module's import lock, so a
+    # thread never gets a module another thread is still importing. Once loaded
+    # it is a cheap lookup.
+    if name in sys.modules:
+        return importlib.import_module(name)
+    with timed(f"import {name}"):
+        return importlib.import_module(name)
+
+
+def report():
+    """Print the timed steps so far; called once the process is ready to serve."""
+    global _ready_after
+    with _lock:
+        steps = list(_steps)
+        _ready_after = time.perf_counter() - _started
+    print(f"[INFO] Startup took {_ready_after:.2f}s:")
+    for label, seconds in steps:
+        print(f"[INFO]   {seconds:7.3f}s  {label}")
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "ready_after": round(_ready_after, 3) if _ready_after is not None else None,
+            "steps": [{"step": label, "seconds": round(seconds, 4)} for label, seconds in _steps],
+        }
@@ -0,0 +1,91 @@
+# text_cleanup.py
+"""
+OCR text cleanup: spelling correction plus splitting of run-together words.
+
+One TextCleaner is built per process (get_cleaner) so the frequency
+dictionary is loaded once. Per-token results are memoized in bounded LRU
+caches, tokens that cannot benefit (numbers, dates, dictionary words) skip
+correction entirely, and the edit-distance-2 search stops once a per-token
+time budget is spent, keeping the best answer found so far.
+"""
+import os
+import re
+import time
+from functools import lru_cache
+
+import wordninja
+from spellchecker import SpellChecker
+
+TOKEN_CACHE_SIZE = int(os.getenv("CLEANUP_CACHE_SIZE", "50000"))
+TOKEN_BUDGET_SEC = float(os.getenv("CLEANUP_TOKEN_BUDGET_MS", "30")) / 1000.0
+SPLIT_MIN_LEN = 10     # only words longer than this are candidates for wordninja
+MAX_CORRECT_LEN = 20   # longer tokens are OCR garbage or identifiers; leave them
+
+_NUMERIC = re.compile(r"^[\d$€£%#+\-.,:/()]*\d[\d$€£%#+\-.,:/()]*$")
+_DATE = re.compile(
+    r"^(\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|"
+    r"(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?,?)$",
+    re.IGNORECASE,
+)
+
+
+class TextCleaner:
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE, token_budget: float = TOKEN_BUDGET_SEC):
+        self.spell = SpellChecker()
+        self.token_budget = token_budget
+        self.budget_exceeded = 0
+        self.correct = lru_cache(maxsize=cache_size)(self._correct)
+        self.split = lru_cache(maxsize=cache_size)(self._split)
+
+    def _skip_correction(self, word: str) -> bool:
+        if len(word) <= 1 or len(word) > MAX_CORRECT_LEN:
+            return True
+        if _NUMERIC.match(word) or _DATE.match(word):
+            return True
+        return bool(self.spell.known([word]))
+
+    def _best(self, candidates):
+        return max(candidates, key=lambda w: self.spell[w])
+
+    def _correct(self, word: str) -> str:
+        """Most probable spelling of word, or word itself if nothing better is found in time."""
+        if self._skip_correction(word):
+            return word
+        deadline = time.perf_counter() + self.token_budget
+
+        edits1 = list(self.spell.edit_distance_1(word))
+        known = self.spell.known(edits1)
+        if known:
+            return self._best(known)
+
+        found = set()
+        for e1 in edits1:
+            if time.perf_counter() > deadline:
+                self.budget_exceeded += 1
+                break
+            found |= self.spell.known(self.spell.edit_distance_1(e1))
+        return self._best(found) if found else word
+
+    def _split(self, word: str) -> tuple:
+        return tuple(wordninja.split(word)) if len(word) > SPLIT_MIN_LEN else (word,)
+
+    def clean(self, text: str) -> str:
+        corrected = [self.correct(w) for w in text.split()]
+        split_words = []
+        for w in corrected:
+            split_words.extend(self.split(w))
+        return " ".join(split_words)
+
+    def stats(self) -> dict:
+        c, s = self.correct.cache_info(), self.split.cache_info()
+        return {
+            "correct": {"hits": c.hits, "misses": c.misses, "size": c.currsize, "max_size": c.maxsize},
+            "split": {"hits": s.hits, "misses": s.misses, "size": s.currsize, "max_size": s.maxsize},
+            "budget_exceeded": self.budget_exceeded,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_cleaner() -> TextCleaner:
+    """Process-wide cleaner; the dictionary is loaded on first use."""
+    return TextCleaner()
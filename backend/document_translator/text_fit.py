@@ -0,0 +1,188 @@
+# text_fit.py
+"""
+Text-fitting engine for the image renderer.
+
+Instead of loading a font at every size from 1 upward and re-measuring,
+the text is measured once at REFERENCE_SIZE and the largest fitting size
+is found by bisection over those metrics (glyph advances scale linearly
+with the point size). Only sizes next to the winner are loaded and checked
+against the real glyph bounding box.
+"""
+from typing import Callable, NamedTuple, Optional
+
+REFERENCE_SIZE = 64
+MIN_SIZE = 1
+MAX_SIZE = 499
+MAX_NUDGE = 3
+
+
+class TextMetrics(NamedTuple):
+    """Measurements of one string taken at REFERENCE_SIZE."""
+    text: str
+    bbox: tuple            # ink bbox of the whole string on one line
+    words: list            # [(word, advance), ...]
+    space: float           # advance of a single space
+    line_height: float     # ascent + descent
+
+
+class FitResult(NamedTuple):
+    """Chosen font plus where to draw each line, relative to the box origin."""
+    font: object
+    size: int
+    placements: list       # [(line_text, x, y), ...]
+
+
+def measure_text(text: str, ref_font) -> TextMetrics:
+    """Collect everything the fitter needs from a single reference-size font."""
+    words = [(w, ref_font.getlength(w)) for w in text.split()]
+    ascent, descent = ref_font.getmetrics()
+    return TextMetrics(
+        text=text,
+        bbox=ref_font.getbbox(text),
+        words=words,
+        space=ref_font.getlength(" "),
+        line_height=ascent + descent,
+    )
+
+
+def _scale(value: float, size: int) -> float:
+    return value * size / REFERENCE_SIZE
+
+
+def _wrap(metrics: TextMetrics, size: int, width: float) -> Optional[list]:
+    """Greedy word wrap at the given size; None if a single word is too wide."""
+    lines = []
+    current, current_w = [], 0.0
+    space = _scale(metrics.space, size)
+    for word, advance in metrics.words:
+        w = _scale(advance, size)
+        if w > width:
+            return None
+        if current and current_w + space + w > width:
+            lines.append(" ".join(current))
+            current, current_w = [word], w
+        else:
+            current_w = current_w + space + w if current else w
+            current.append(word)
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def _fits_single(metrics: TextMetrics, size: int, width: float, height: float) -> bool:
+    l, t, r, b = metrics.bbox
+    return _scale(r - l, size) <= width and _scale(b - t, size) <= height
+
+
+def _fits_wrapped(metrics: TextMetrics, size: int, width: float, height: float) -> bool:
+    lines = _wrap(metrics, size, width)
+    if lines is None:
+        return False
+    return len(lines) * _scale(metrics.line_height, size) <= height
+
+
+def largest_fitting(fits: Callable[[int], bool], guess: int, lo: int = MIN_SIZE, hi: int = MAX_SIZE) -> int:
+    """
+    Largest size in [lo, hi] for which fits(size) holds (0 if none), assuming
+    fits is monotonic. The first two probes are the guess and its neighbour,
+    so a good estimate settles in two steps; otherwise it degrades to bisection.
+    """
+    best = 0
+    probe = max(lo, min(hi, guess))
+    while lo <= hi:
+        if fits(probe):
+            best = probe
+            lo = probe + 1
+            probe = lo if probe == guess else (lo + hi) // 2
+        else:
+            hi = probe - 1
+            probe = hi if probe == guess else (lo + hi) // 2
+    return best
+
+
+def _estimate(metrics: TextMetrics, width: float, height: float) -> int:
+    l, t, r, b = metrics.bbox
+    w, h = max(r - l, 1), max(b - t, 1)
+    return int(REFERENCE_SIZE * min(width / w, height / h))
+
+
+def _place_single(font, text: str, width: float, height: float) -> Optional[list]:
+    l, t, r, b = font.getbbox(text)
+    w, h = r - l, b - t
+    if w > width or h > height:
+        return None
+    return [(text, int((width - w) // 2 - l), int((height - h) // 2 - t))]
+
+
+def _place_wrapped(font, lines: list, width: float, height: float) -> Optional[list]:
+    ascent, descent = font.getmetrics()
+    line_h = ascent + descent
+    total_h = line_h * len(lines)
+    if total_h > height:
+        return None
+    placements = []
+    y = (height - total_h) // 2
+    for line in lines:
+        w = font.getlength(line)
+        if w > width:
+            return None
+        placements.append((line, int((width - w) // 2), int(y)))
+        y += line_h
+    return placements
+
+
+def fit_text(text: str, width: float, height: float, load_font: Callable[[int], object]) -> FitResult:
+    """
+    Find the largest font size at which text fits a width x height box,
+    either on one line or word-wrapped over several. load_font(size) must
+    return a FreeType font; it is called for the reference size and then
+    only for the handful of sizes around the bisection result.
+    """
+    if not text or width <= 0 or height <= 0:
+        return FitResult(None, 0, [(text, 0, 0)])
+
+    metrics = measure_text(text, load_font(REFERENCE_SIZE))
+    guess = _estimate(metrics, width, height)
+
+    single = largest_fitting(lambda s: _fits_single(metrics, s, width, height), guess)
+    wrapped = 0
+    if len(metrics.words) > 1:
+        wrapped = largest_fitting(lambda s: _fits_wrapped(metrics, s, width, height), guess // 2)
+
+    def place_single(font, size):
+        return _place_single(font, text, width, height)
+
+    def place_wrapped(font, size):
+        lines = _wrap(metrics, size, width) if len(metrics.words) > 1 else None
+        return _place_wrapped(font, lines, width, height) if lines else None
+
+    def place(size, wrap_first):
+        font = load_font(size)
+        # The layout that won the bisection first; the other can still fit after hinting
+        layouts = (place_wrapped, place_single) if wrap_first else (place_single, place_wrapped)
+        for layout in layouts:
+            placements = layout(font, size)
+            if placements:
+                return font, placements
+        return font, None
+
+    # Hinting makes the real bbox drift a pixel or two from the scaled
+    # estimate, so the chosen size is verified with the actual font and
+    # nudged down until it fits, then up (in either layout) until it is tight.
+    size = max(single, wrapped)
+    while size >= MIN_SIZE:
+        font, placements = place(size, wrapped > single)
+        if placements:
+            break
+        size -= 1
+    else:
+        return FitResult(None, 0, [(text, 0, 0)])
+
+    for _ in range(MAX_NUDGE):
+        if size >= MAX_SIZE:
+            break
+        bigger_font, bigger = place(size + 1, wrapped > single)
+        if not bigger:
+            break
+        size, font, placements = size + 1, bigger_font, bigger
+    return FitResult(font, size, placements)
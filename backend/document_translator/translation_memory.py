@@ -0,0 +1,144 @@
+# translation_memory.py
+"""
+Persistent translation memory backed by SQLite.
+
+Entries are keyed by (source lang, target lang, text with whitespace
+collapsed) and remember which provider produced them. Case is kept: "May"
+and "may", or "US" and "us", translate differently. Lookups ignore entries
+older than the TTL. Every TM_EVICT_EVERY stored rows, a write prunes
+expired rows and trims the table to max_entries by least-recent use, so
+the table may briefly run that many rows over. The database runs in WAL
+mode so several worker processes can share one file.
+
+The file lives in the data directory (ALIBI_DATA_DIR, else
+$XDG_DATA_HOME/alibi), not in the source tree, unless
+TRANSLATION_MEMORY_PATH says otherwise.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DATA_DIR = os.getenv("ALIBI_DATA_DIR") or os.path.join(
+    os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), "alibi"
+)
+TM_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(DATA_DIR, "translation_memory.sqlite3"))
+TM_TTL_DAYS = float(os.getenv("TRANSLATION_MEMORY_TTL_DAYS", "30"))
+TM_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "200000"))
+TM_EVICT_EVERY = int(os.getenv("TRANSLATION_MEMORY_EVICT_EVERY", "500"))
+SCHEMA_VERSION = 1  # 1: keys are no longer casefolded
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", text).strip()
+
+
+class TranslationMemory:
+    def __init__(self, path: str = TM_PATH, ttl_days: float = TM_TTL_DAYS, max_entries: int = TM_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_provider = {}
+        self._stored_since_evict = TM_EVICT_EVERY  # evict on the first write after opening
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tm (
+                   src TEXT NOT NULL,
+                   dest TEXT NOT NULL,
+                   key TEXT NOT NULL,
+                   translation TEXT NOT NULL,
+                   provider TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (src, dest, key)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tm_last_used ON tm (last_used)")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            # Casefolded keys from older versions can't be told apart by case; drop them
+            self._conn.execute("DELETE FROM tm")
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def lookup(self, texts, src: str, dest: str) -> dict:
+        """Map index -> translation for every non-empty text found in memory."""
+        keys = {}
+        for i, t in enumerate(texts):
+            if t and t.strip():
+                keys.setdefault(normalize_text(t), []).append(i)
+        if not keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, translation, provider FROM tm WHERE src=? AND dest=? AND created>=? "
+                    f"AND key IN ({','.join('?' * len(chunk))})",
+                    [src, dest, now - self.ttl, *chunk],
+                ).fetchall()
+                for key, translation, provider in rows:
+                    for i in keys[key]:
+                        found[i] = translation
+                    self.hits_by_provider[provider] = self.hits_by_provider.get(provider, 0) + len(keys[key])
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE tm SET last_used=? WHERE src=? AND dest=? AND key=?",
+                        [(now, src, dest, key) for key, _, _ in rows],
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += sum(len(v) for v in keys.values()) - len(found)
+        return found
+
+    def store(self, pairs, src: str, dest: str, provider: str):
+        """Record (source_text, translation) pairs produced by provider."""
+        now = time.time()
+        rows = [
+            (src, dest, normalize_text(s), t, provider, now, now)
+            for s, t in pairs if s and s.strip() and t
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO tm VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._stored_since_evict += len(rows)
+            if self._stored_since_evict >= TM_EVICT_EVERY:
+                self._evict(now)
+                self._stored_since_evict = 0
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM tm WHERE created<?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM tm").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM tm WHERE rowid IN (SELECT rowid FROM tm ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM tm").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "hits_by_provider": dict(self.hits_by_provider),
+            }
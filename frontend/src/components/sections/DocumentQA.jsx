@@ -38,34 +38,99 @@ const DocumentQA = () => {
         target_lang: selectedLangCode
       };
 
+      const sessionId =
+        typeof window !== 'undefined' && window.localStorage.getItem('alibi_chat_session');
+      if (sessionId) {
+        payload.session_id = sessionId;
+      }
+
       const fileName =
         typeof window !== 'undefined' && window.localStorage.getItem('alibi_output_filename');
       if (fileName) {
         payload.image_filename = fileName; // 'translated.png'
       }
 
-      const res = await fetch('http://localhost:8001/api/chat', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload)
-      });
+      // Show the answer as it streams in: append "token" events to a bot bubble,
+      // then settle it with the "done" event.
+      const botId = `bot-${Date.now()}`;
+      setMessages(prev => [
+        ...prev,
+        { id: botId, role: 'bot', content: '', lang: selectedLangCode === 'auto' ? 'en' : selectedLangCode }
+      ]);
+      const updateBot = (update) =>
+        setMessages(prev => prev.map(m => (m.id === botId ? { ...m, ...update(m) } : m)));
 
-      if (!res.ok) {
-        throw new Error(`HTTP ${res.status}`);
-      }
+      let data = null;
+      let streamed = false;
+      try {
+        const res = await fetch('http://localhost:8001/api/chat/stream', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(payload)
+        });
 
-      const data = await res.json();
+        if (!res.ok || !res.body) {
+          throw new Error(`HTTP ${res.status}`);
+        }
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          let sep;
+          while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const event = (raw.match(/^event: (.*)$/m) || [])[1];
+            const body = (raw.match(/^data: (.*)$/m) || [])[1];
+            if (!body) continue;
+            const parsed = JSON.parse(body);
+            if (event === 'token') {
+              streamed = true;
+              updateBot(m => ({ content: m.content + parsed.text }));
+            } else if (event === 'done') {
+              data = parsed;
+            } else if (event === 'error') {
+              throw new Error(parsed.detail || 'stream error');
+            }
+          }
+        }
+        if (!data && !streamed) {
+          throw new Error('stream ended without a reply');
+        }
+      } catch (streamErr) {
+        // Nothing shown yet: ask the plain endpoint instead
+        if (streamed) throw streamErr;
+        console.warn('Streaming chat failed, retrying without streaming:', streamErr);
+        try {
+          const res = await fetch('http://localhost:8001/api/chat', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+          });
+          if (!res.ok) {
+            throw new Error(`HTTP ${res.status}`);
+          }
+          data = await res.json();
+        } catch (err) {
+          setMessages(prev => prev.filter(m => m.id !== botId));
+          throw err;
+        }
+      }
 
       if (data?.target_lang && typeof window !== 'undefined') {
         window.localStorage.setItem('alibi_target_lang', data.target_lang);
       }
-
-      const botMessage = {
-        role: 'bot',
-        content: data?.reply ?? 'No response',
-        lang: data?.target_lang || 'en'
-      };
-      setMessages(prev => [...prev, botMessage]);
+      if (data?.session_id && typeof window !== 'undefined') {
+        window.localStorage.setItem('alibi_chat_session', data.session_id);
+      }
+      updateBot(m => ({
+        content: data?.reply ?? (m.content || 'No response'),
+        lang: data?.target_lang || m.lang || 'en'
+      }));
     } catch (err) {
       console.error(err);
       toast({
@@ -13,6 +13,7 @@ const TranslationTool = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [translatedImage, setTranslatedImage] = useState(null);
   const [dragOver, setDragOver] = useState(false);
+  const [plateId, setPlateId] = useState(null); // server-side clean plate of the current file
   const fileInputRef = useRef(null);
   const { toast } = useToast();
 
@@ -37,6 +38,7 @@ const TranslationTool = () => {
     }
     setSelectedFile(file);
     setTranslatedImage(null);
+    setPlateId(null);
   };
 
   const handleDrop = (e) => {
@@ -61,9 +63,33 @@ const TranslationTool = () => {
 
     setIsLoading(true);
     try {
+      // Same file, new language: redraw from the cached plate instead of re-uploading
+      if (plateId) {
+        const rerender = await fetch(
+          `http://localhost:8000/plates/${plateId}?targetLanguage=${encodeURIComponent(selectedLanguage)}&persist=1`
+        );
+        if (rerender.ok) {
+          setTranslatedImage(URL.createObjectURL(await rerender.blob()));
+          if (typeof window !== 'undefined') {
+            window.localStorage.setItem('alibi_target_lang', selectedLanguage);
+            const artifact = rerender.headers.get('X-Artifact-Name');
+            if (artifact) {
+              window.localStorage.setItem('alibi_output_filename', artifact); // the re-rendered output
+            }
+          }
+          toast({
+            title: "Translation completed!",
+            description: "Your document has been successfully translated."
+          });
+          return;
+        }
+        setPlateId(null); // expired on the server; fall through to a full upload
+      }
+
       const formData = new FormData();
       formData.append('image', selectedFile);
       formData.append('targetLanguage', selectedLanguage);
+      formData.append('persist', '1'); // keep the output on the server for the chatbot
 
       const response = await fetch('http://localhost:8000/upload-image', {
         method: 'POST',
@@ -77,11 +103,15 @@ const TranslationTool = () => {
       const result = await response.blob();
       const imageUrl = URL.createObjectURL(result);
       setTranslatedImage(imageUrl);
+      setPlateId(response.headers.get('X-Plate-Id'));
 
       // 🔗 Share with chatbot (language + known output filename)
       if (typeof window !== 'undefined') {
         window.localStorage.setItem('alibi_target_lang', selectedLanguage);
-        window.localStorage.setItem('alibi_output_filename', 'translated.png'); // Flask writes this fixed name
+        const artifact = response.headers.get('X-Artifact-Name');
+        if (artifact) {
+          window.localStorage.setItem('alibi_output_filename', artifact); // per-request name from Flask
+        }
       }
 
       toast({
@@ -103,6 +133,7 @@ const TranslationTool = () => {
   const clearFile = () => {
     setSelectedFile(null);
     setTranslatedImage(null);
+    setPlateId(null);
     if (fileInputRef.current) fileInputRef.current.value = '';
   };
 
@@ -1,5 +1,29 @@
-from flask import Flask
-from .backend.document_translator import server
-app = Flask(__name__)
+# main.py
+"""
+Run the document translator from the repo root: python main.py [--workers N ...]
+(see backend/document_translator/serve.py).
 
-app.register_blueprint(server.alibi_entry)
\ No newline at end of file
+The Flask app is exposed as `app` when this file runs as a script or is
+imported under a package name (Alibi.main:app). A bare "main" import
+clashes with the translator's own main module; WSGI servers started from
+the root should use --chdir backend/document_translator server:app.
+"""
+import os
+import sys
+
+if __name__ == "main":
+    raise ImportError("the translator imports its own module as 'main'; "
+                      "serve server:app from backend/document_translator instead")
+
+# The translator's modules import each other by bare name (server -> main, ...),
+# so its folder goes first on the path, ahead of this main.py.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "document_translator"))
+
+import serve  # noqa: E402  (before server: it sets the prefork defaults, /jobs off)
+
+# Job and page-pool processes re-import this script as __mp_main__ and don't need the app
+if __name__ != "__mp_main__":
+    from server import app  # noqa: E402,F401
+
+if __name__ == "__main__":
+    serve.main()
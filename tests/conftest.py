@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The backends' modules import each other by bare name, as when run from their folders
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("backend/document_translator", "backend/NLP_chatbot"):
+    sys.path.insert(0, os.path.join(ROOT, *folder.split("/")))
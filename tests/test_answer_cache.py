@@ -0,0 +1,72 @@
+from answer_cache import AnswerCache, _negations, _words, normalize_question
+
+
+def cache_with(question, answer="cached", doc="doc", lang="en", **kwargs):
+    cache = AnswerCache(**kwargs)
+    cache.put(cache.key(doc, lang, question), answer)
+    return cache
+
+
+def ask(cache, question, doc="doc", lang="en"):
+    return cache.get(cache.key(doc, lang, question))
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    cache = cache_with("What is the deadline?")
+    assert ask(cache, "what is the DEADLINE") == "cached"
+    assert cache.hits == 1
+
+
+def test_light_rewording_is_a_near_hit():
+    cache = cache_with("What is the deadline to file the form?")
+    assert ask(cache, "What is the deadline to file this form?") == "cached"
+    assert cache.near_hits == 1
+
+
+def test_added_negation_never_matches():
+    cache = cache_with("Who must sign the form?")
+    assert ask(cache, "Who must not sign the form?") is None
+    assert cache.misses == 1
+
+
+def test_removed_negation_never_matches():
+    cache = cache_with("Who must not sign the form?")
+    assert ask(cache, "Who must sign the form?") is None
+    assert ask(cache, "Who must not sign the form, please?") == "cached"
+
+
+def test_contractions_count_as_negations():
+    cache = cache_with("Is the fee due by Friday?")
+    assert ask(cache, "Isn't the fee due by Friday?") is None
+
+
+def test_negations_in_other_languages():
+    assert _negations(_words(normalize_question("¿Quién no debe firmar?"))) == {"no"}
+    assert _negations(_words(normalize_question("Wer muss nicht unterschreiben?"))) == {"nicht"}
+    assert _negations(_words(normalize_question("这个表格不需要签名吗"))) == {"格不", "不需"}
+    assert not _negations(_words(normalize_question("这个表格需要签名吗")))
+
+
+def test_different_numbers_never_match():
+    cache = cache_with("Is the fee not due on page 2?")
+    assert ask(cache, "Is the fee not due on page 3?") is None
+
+
+def test_scoped_to_document_and_language():
+    cache = cache_with("What is the deadline?")
+    assert ask(cache, "What is the deadline?", doc="other") is None
+    assert ask(cache, "What is the deadline?", lang="es") is None
+
+
+def test_entries_expire():
+    cache = cache_with("What is the deadline?", ttl_sec=-1)
+    assert ask(cache, "What is the deadline?") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_dropped():
+    cache = AnswerCache(max_entries=2)
+    for question in ("first question", "second question", "third question"):
+        cache.put(cache.key("doc", "en", question), question)
+    assert ask(cache, "first question") is None
+    assert ask(cache, "third question") == "third question"
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+def echo(payload, progress):
+    if payload == "sleep":
+        time.sleep(30)
+    return payload
+
+
+def wait_for(queue, job, statuses, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if job.status in statuses:
+            return job.status
+        time.sleep(0.05)
+    raise AssertionError(f"job stayed {job.status}")
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(**kwargs):
+        kwargs.setdefault("handler", echo)
+        kwargs.setdefault("workers", 1)
+        queues.append(jobs.JobQueue(preload=(), **kwargs))
+        return queues[-1]
+
+    yield make
+    for queue in queues:
+        queue.shutdown()
+
+
+def test_runs_a_job(make_queue):
+    queue = make_queue()
+    job = queue.submit("hello")
+    assert wait_for(queue, job, jobs.FINISHED) == jobs.DONE
+    assert job.result == "hello"
+
+
+def test_times_out_and_replaces_the_worker(make_queue):
+    queue = make_queue(timeout=0.5)
+    stuck = queue.submit("sleep")
+    assert wait_for(queue, stuck, jobs.FINISHED) == jobs.TIMED_OUT
+    job = queue.submit("after")
+    assert wait_for(queue, job, jobs.FINISHED) == jobs.DONE
+    assert queue.stats()[jobs.TIMED_OUT] == 1
+
+
+def test_cancels_a_running_job(make_queue):
+    queue = make_queue()
+    job = queue.submit("sleep")
+    wait_for(queue, job, (jobs.RUNNING,))
+    assert queue.cancel(job.id)
+    assert job.status == jobs.CANCELLED
+    assert not queue.cancel(job.id)
+    after = queue.submit("after")
+    assert wait_for(queue, after, jobs.FINISHED) == jobs.DONE
+
+
+def test_cancels_a_queued_job(make_queue):
+    queue = make_queue()
+    running = queue.submit("sleep")
+    queued = queue.submit("never")
+    assert queue.cancel(queued.id)
+    assert queued.status == jobs.CANCELLED
+    queue.cancel(running.id)
+
+
+def test_rejects_when_full(make_queue):
+    queue = make_queue(max_queued=1)
+    queue.submit("sleep")
+    wait_for(queue, queue._jobs[next(iter(queue._jobs))], (jobs.RUNNING,))
+    queue.submit("waiting")
+    with pytest.raises(jobs.QueueFull):
+        queue.submit("one too many")
+
+
+def test_on_done_runs_outside_the_lock_before_done(make_queue):
+    seen = []
+    release = threading.Event()
+
+    def on_done(job):
+        seen.append(job.status)
+        release.wait(10)
+
+    queue = make_queue(on_done=on_done)
+    job = queue.submit("hello")
+    deadline = time.time() + 20
+    while not seen and time.time() < deadline:
+        time.sleep(0.05)
+    assert seen == [jobs.RUNNING]
+    assert queue.get(job.id) is job  # polls are not blocked by the hook
+    assert job.status == jobs.RUNNING
+    release.set()
+    assert wait_for(queue, job, jobs.FINISHED) == jobs.DONE
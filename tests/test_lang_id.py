@@ -0,0 +1,43 @@
+import pytest
+
+import lang_id
+from lang_id import identify
+
+
+@pytest.mark.parametrize("text, lang", [
+    ("안녕하세요", "ko"),
+    ("こんにちは", "ja"),
+    ("日本語のテキスト", "ja"),   # kana decides over han
+    ("你好吗", "zh-cn"),
+    ("नमस्ते", "hi"),
+    ("مرحبا كيف حالك", "ar"),
+    ("سلام، حال شما چطور است؟ من گرسنه هستم", "fa"),
+    ("Привіт, як справи? Дякую", "uk"),
+    ("Привет", "ru"),
+    ("Where do I sign this form?", "en"),
+])
+def test_identifies(text, lang):
+    assert identify(text) == lang
+
+
+@pytest.mark.parametrize("text", ["", "   ", "12345", "hi", "ok thx"])
+def test_too_short_or_no_letters(text):
+    assert identify(text) is None
+
+
+def test_unmarked_cyrillic_goes_to_langdetect_past_the_threshold(monkeypatch):
+    monkeypatch.setattr(lang_id, "_detect", lambda text: "bg")
+    long_text = "б" * lang_id.LANG_ID_MIN_DETECT_LETTERS
+    assert lang_id._identify(long_text) == "bg"
+    assert lang_id._identify(long_text[1:]) == "ru"
+
+
+def test_detected_language_outside_the_script_falls_back(monkeypatch):
+    monkeypatch.setattr(lang_id, "_detect", lambda text: "de")
+    assert lang_id._identify("Здравствуйте, как дела?") == "ru"
+
+
+def test_long_messages_skip_the_memo():
+    text = "Where do I sign this form? " * 20
+    assert len(text) > lang_id.MEMO_MAX_CHARS
+    assert identify(text) == "en"
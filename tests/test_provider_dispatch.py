@@ -0,0 +1,107 @@
+import pytest
+
+import provider_dispatch
+import provider_health
+from provider_dispatch import RateLimited, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(provider_dispatch, "time", fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(provider_dispatch, "_buckets", {})
+    monkeypatch.setattr(provider_health, "_health", {})
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    for _ in range(2):
+        bucket.acquire()
+    assert clock.slept == []
+    assert bucket.tokens == pytest.approx(0)
+
+
+def test_throttle_pauses_and_halves_the_rate(clock):
+    bucket = TokenBucket(rate=8)
+    bucket.throttled(3.0)
+    assert bucket.rate == 4
+    bucket.acquire()
+    assert sum(clock.slept) >= 3.0
+
+
+def test_successes_creep_back_to_the_ceiling(clock):
+    bucket = TokenBucket(rate=10)
+    bucket.throttled(0)
+    bucket.throttled(0)
+    assert bucket.rate == 2.5
+    bucket.succeeded()
+    assert bucket.rate == pytest.approx(3.0)  # +5% of the ceiling per success
+    for _ in range(100):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_rate_never_drops_below_the_floor(clock):
+    bucket = TokenBucket(rate=1)
+    for _ in range(20):
+        bucket.throttled(0)
+    assert bucket.rate == pytest.approx(0.1)
+
+
+def test_dispatch_keeps_input_order(monkeypatch):
+    monkeypatch.setitem(provider_dispatch.PROVIDER_RPS, "test", 1000.0)
+    items = [f"t{i}" for i in range(20)]
+    assert provider_dispatch.dispatch("test", str.upper, items, max_workers=4) == [t.upper() for t in items]
+
+
+def test_dispatch_retries_after_a_429(clock):
+    calls = []
+
+    def fn(item):
+        calls.append(item)
+        if len(calls) == 1:
+            raise RateLimited(retry_after=2)
+        return item
+
+    assert provider_dispatch.dispatch("test", fn, ["a"], max_workers=1) == ["a"]
+    assert calls == ["a", "a"]
+    assert provider_dispatch.bucket_for("test").rate < provider_dispatch.bucket_for("test").max_rate
+    assert sum(clock.slept) >= 2
+
+
+def test_dispatch_returns_default_after_errors():
+    def fn(item):
+        raise ValueError("boom")
+
+    assert provider_dispatch.dispatch("test", fn, ["a", "b"], default=None, max_workers=1) == [None, None]
+    assert provider_health.health_for("test").failures == 2
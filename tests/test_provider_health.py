@@ -0,0 +1,106 @@
+import pytest
+
+import provider_health
+from provider_health import CLOSED, HALF_OPEN, OPEN, ProviderHealth
+
+
+def trip(health):
+    for _ in range(provider_health.BREAKER_FAILURES):
+        health.record(False, 0.1)
+
+
+def test_opens_after_consecutive_failures():
+    health = ProviderHealth("p")
+    for _ in range(provider_health.BREAKER_FAILURES - 1):
+        health.record(False, 0.1)
+    assert health.state == CLOSED
+    health.record(False, 0.1)
+    assert health.state == OPEN
+    assert not health.allow()
+    assert not health.available()
+
+
+def test_a_good_call_resets_the_count():
+    health = ProviderHealth("p")
+    for _ in range(provider_health.BREAKER_FAILURES - 1):
+        health.record(False, 0.1)
+    health.record(True, 0.1)
+    health.record(False, 0.1)
+    assert health.state == CLOSED
+
+
+def test_slow_calls_count_as_bad():
+    health = ProviderHealth("p")
+    for _ in range(provider_health.BREAKER_FAILURES):
+        health.record(True, provider_health.BREAKER_SLOW_SEC + 1)
+    assert health.state == OPEN
+    assert health.slow_calls == provider_health.BREAKER_FAILURES
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    health = ProviderHealth("p")
+    trip(health)
+    health.cooldown = 0
+    assert health.available()
+    assert health.allow()
+    assert health.state == HALF_OPEN
+    assert not health.allow()  # only one trial at a time
+    health.record(True, 0.1)
+    assert health.state == CLOSED
+    assert health.cooldown == provider_health.BREAKER_COOLDOWN_SEC
+
+
+def test_failed_trial_reopens_with_a_longer_cooldown():
+    health = ProviderHealth("p")
+    trip(health)
+    health.cooldown = 10
+    health.opened_at -= 10
+    assert health.allow()
+    health.record(False, 0.1)
+    assert health.state == OPEN
+    assert health.cooldown == 20
+
+
+def test_probed_provider_waits_for_the_probe():
+    health = ProviderHealth("p")
+    trip(health)
+    calls = []
+    health.probe = lambda: calls.append(1)
+    health.cooldown = 0
+    assert not health.allow()
+    assert not health.available()
+    health.run_probe()
+    assert calls == [1]
+    assert health.state == CLOSED
+
+
+def test_failed_probe_keeps_the_breaker_open():
+    health = ProviderHealth("p")
+    trip(health)
+
+    def probe():
+        raise RuntimeError("still down")
+
+    health.probe = probe
+    health.cooldown = 0
+    health.run_probe()
+    assert health.state == OPEN
+    assert health.cooldown == 0  # doubled from zero
+
+
+def test_probe_waits_for_the_cooldown():
+    health = ProviderHealth("p")
+    trip(health)
+    health.probe = lambda: pytest.fail("probed during the cooldown")
+    health.cooldown = 60
+    health.run_probe()
+    assert health.state == OPEN
+
+
+def test_order_by_speed_puts_measured_providers_first(monkeypatch):
+    monkeypatch.setattr(provider_health, "_health", {})
+    for _ in range(provider_health.MIN_SAMPLES):
+        provider_health.health_for("slow").record(True, 2.0)
+        provider_health.health_for("fast").record(True, 0.5)
+    provider_health.health_for("new").record(True, 0.01)
+    assert provider_health.order_by_speed(["new", "slow", "fast"]) == ["fast", "slow", "new"]
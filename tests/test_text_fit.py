@@ -0,0 +1,90 @@
+import math
+
+import pytest
+
+import text_fit
+from text_fit import fit_text, largest_fitting
+
+
+class FakeFont:
+    """
+    Advances scale linearly with size. overhang widens the ink box at the
+    reference size only, the way hinting makes the reference estimate drift.
+    """
+
+    def __init__(self, size, char_w=0.5, descent=0.25, overhang=0):
+        self.size = size
+        self.char_w = char_w
+        self.descent = descent
+        self.overhang = overhang if size == text_fit.REFERENCE_SIZE else 0
+
+    def getlength(self, text):
+        return len(text) * self.char_w * self.size
+
+    def getbbox(self, text):
+        return 0, 0, math.ceil(self.getlength(text)) + self.overhang, self.size
+
+    def getmetrics(self):
+        return self.size, math.ceil(self.size * self.descent)
+
+
+def linear_scan(text, width, height, make_font):
+    best = 0
+    for size in range(1, 500):
+        l, t, r, b = make_font(size).getbbox(text)
+        if r - l > width or b - t > height:
+            break
+        best = size
+    return best
+
+
+@pytest.mark.parametrize("limit", [1, 2, 17, 250, 499])
+@pytest.mark.parametrize("guess", [1, 16, 17, 18, 400])
+def test_largest_fitting_matches_a_scan(limit, guess):
+    calls = []
+
+    def fits(size):
+        calls.append(size)
+        return size <= limit
+
+    assert largest_fitting(fits, guess) == limit
+    assert len(calls) <= 12
+
+
+def test_largest_fitting_none_fit():
+    assert largest_fitting(lambda size: False, 50) == 0
+
+
+def test_good_guess_settles_in_two_probes():
+    calls = []
+    largest_fitting(lambda size: calls.append(size) or size <= 30, 30)
+    assert calls == [30, 31]
+
+
+@pytest.mark.parametrize("width,height", [(132, 39), (40, 100), (300, 20), (77, 77)])
+def test_single_line_matches_linear_scan(width, height):
+    text = "Hello"
+    result = fit_text(text, width, height, FakeFont)
+    assert result.size == linear_scan(text, width, height, FakeFont)
+    assert result.placements[0][0] == text
+
+
+def test_wrapped_text_uses_several_lines():
+    result = fit_text("one two three four", 60, 200, FakeFont)
+    assert len(result.placements) > 1
+    assert result.size > linear_scan("one two three four", 60, 200, FakeFont)
+
+
+def test_nudges_up_from_a_one_line_wrapped_layout():
+    # The reference bbox overestimates the width, so bisection prefers the (tall)
+    # wrapped layout; the real single-line bbox fits three sizes larger.
+    make_font = lambda size: FakeFont(size, descent=2, overhang=200)
+    text = "Wwwwwwwwww iiiii"
+    result = fit_text(text, 132, 39, make_font)
+    assert result.size == linear_scan(text, 132, 39, make_font) == 16
+    assert result.placements[0][0] == text
+
+
+def test_empty_text_or_box():
+    assert fit_text("", 10, 10, FakeFont).size == 0
+    assert fit_text("hi", 0, 10, FakeFont).size == 0